@@ -1,6 +1,12 @@
 from PIL import Image, ImageDraw, ImageFont
 import os
 
+def draw_centered_text(draw, text, y, font, img_width=400):
+    """Draw text horizontally centered at the given y position"""
+    bbox = draw.textbbox((0, 0), text, font=font)
+    x = (img_width - (bbox[2] - bbox[0])) // 2
+    draw.text((x, y), text, fill='white', font=font)
+
 def create_test_images():
     """Create test images for different facial expressions"""
     
@@ -124,37 +130,29 @@ def create_test_images():
         }
     }
     
+    # Load the fonts once: truetype() re-reads and re-rasterizes the font
+    # file, so doing it per image multiplied that cost by every expression
+    try:
+        font = ImageFont.truetype("arial.ttf", 24)
+        emoji_font = ImageFont.truetype("arial.ttf", 48)
+    except:
+        font = ImageFont.load_default()
+        emoji_font = ImageFont.load_default()
+
+    # One working image + draw context for the whole run: each iteration
+    # just repaints the background instead of allocating a fresh 400x300
+    # buffer and draw object
+    img = Image.new('RGB', (400, 300))
+    draw = ImageDraw.Draw(img)
+
     # Create each test image
     for expression, data in test_images.items():
-        # Create image
-        img = Image.new('RGB', (400, 300), data['color'])
-        draw = ImageDraw.Draw(img)
-        
-        # Try to use a default font, fallback if not available
-        try:
-            font = ImageFont.truetype("arial.ttf", 24)
-            emoji_font = ImageFont.truetype("arial.ttf", 48)
-        except:
-            font = ImageFont.load_default()
-            emoji_font = ImageFont.load_default()
-        
-        # Draw text
-        text_bbox = draw.textbbox((0, 0), data['text'], font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
-        
-        text_x = (400 - text_width) // 2
-        text_y = 100
-        
-        draw.text((text_x, text_y), data['text'], fill='white', font=font)
-        
-        # Draw emoji
-        emoji_bbox = draw.textbbox((0, 0), data['emoji'], font=emoji_font)
-        emoji_width = emoji_bbox[2] - emoji_bbox[0]
-        emoji_x = (400 - emoji_width) // 2
-        emoji_y = 150
-        
-        draw.text((emoji_x, emoji_y), data['emoji'], fill='white', font=emoji_font)
+        # Repaint the background in this expression's color
+        draw.rectangle([(0, 0), (400, 300)], fill=data['color'])
+
+        # Draw text and emoji through the shared centering helper
+        draw_centered_text(draw, data['text'], 100, font)
+        draw_centered_text(draw, data['emoji'], 150, emoji_font)
         
         # Save image
         filename = f'sample_images/{expression}.png'
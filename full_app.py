@@ -1,747 +1,1069 @@
-"""
-Full MEME Tracker Web Application with all features
-"""
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Form
-from fastapi.responses import HTMLResponse
-from fastapi.middleware.cors import CORSMiddleware
-import json
-import logging
-import os
-import base64
-import numpy as np
-import time
-from typing import Dict, Optional
-
-# Setup logging first
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-# Try to import OpenCV, fallback to mock detection if not available
-try:
-    import cv2
-    OPENCV_AVAILABLE = True
-    logger.info("OpenCV imported successfully")
-except ImportError as e:
-    OPENCV_AVAILABLE = False
-    logger.warning(f"OpenCV not available: {e}. Using mock detection.")
-
-# Try to import MediaPipe for hand tracking
-try:
-    import mediapipe as mp
-    MEDIAPIPE_AVAILABLE = True
-    logger.info("MediaPipe imported successfully")
-except ImportError as e:
-    MEDIAPIPE_AVAILABLE = False
-    logger.warning(f"MediaPipe not available: {e}. Hand tracking disabled.")
-
-app = FastAPI(title="MEME Tracker Web", version="1.0.0")
-
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# User sessions storage
-user_sessions: Dict[str, Dict] = {}
-
-@app.get("/")
-async def read_root():
-    """Serve the main web interface"""
-    return HTMLResponse(content=get_html_content())
-
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "message": "MEME Tracker is running!"}
-
-@app.websocket("/ws/{client_id}")
-async def websocket_endpoint(websocket: WebSocket, client_id: str):
-    """WebSocket endpoint for real-time detection"""
-    await websocket.accept()
-    logger.info(f"Client {client_id} connected")
-    
-    # Initialize user session
-    user_sessions[client_id] = {
-        "images": {},
-        "current_expression": None,
-        "last_valid_expression": None,
-        "auto_trigger": True
-    }
-    
-    try:
-        while True:
-            # Receive frame data from client
-            data = await websocket.receive_text()
-            frame_data = json.loads(data)
-            
-            # Process frame and return results
-            result = await process_frame(frame_data, client_id)
-            await websocket.send_text(json.dumps(result))
-            
-    except WebSocketDisconnect:
-        logger.info(f"Client {client_id} disconnected")
-        if client_id in user_sessions:
-            del user_sessions[client_id]
-    except Exception as e:
-        logger.error(f"WebSocket error: {e}")
-
-async def process_frame(frame_data: dict, client_id: str) -> dict:
-    """Process a single frame and return detection results"""
-    try:
-        if OPENCV_AVAILABLE:
-            return await process_frame_full(frame_data, client_id)
-        else:
-            return await process_frame_mock(frame_data, client_id)
-    except Exception as e:
-        logger.error(f"Error processing frame: {e}")
-        return {"error": str(e)}
-
-async def process_frame_full(frame_data: dict, client_id: str) -> dict:
-    """Process frame with full detection capabilities"""
-    # Decode base64 frame
-    frame_bytes = base64.b64decode(frame_data["frame"])
-    frame_array = np.frombuffer(frame_bytes, dtype=np.uint8)
-    frame = cv2.imdecode(frame_array, cv2.IMREAD_COLOR)
-    
-    if frame is None:
-        return {"error": "Invalid frame data"}
-    
-    # Get user session
-    session = user_sessions.get(client_id, {"images": {}, "current_expression": None, "last_valid_expression": None})
-    
-    # Initialize cascades if not already done
-    if not hasattr(process_frame_full, 'face_cascade'):
-        process_frame_full.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-    if not hasattr(process_frame_full, 'eye_cascade'):
-        process_frame_full.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-    if not hasattr(process_frame_full, 'smile_cascade'):
-        process_frame_full.smile_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_smile.xml')
-    
-    # Initialize MediaPipe if available
-    if MEDIAPIPE_AVAILABLE and not hasattr(process_frame_full, 'mp_hands'):
-        process_frame_full.mp_hands = mp.solutions.hands
-        process_frame_full.mp_drawing = mp.solutions.drawing_utils
-        process_frame_full.hands = process_frame_full.mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=2,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-    
-    # Convert to grayscale for detection
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    
-    # Face detection
-    faces = process_frame_full.face_cascade.detectMultiScale(gray, 1.1, 4)
-    
-    # Initialize variables
-    expression = None
-    face_ratio = 0
-    faces_detected = len(faces)
-    is_smiling = False
-    is_mouth_open = False
-    eyes_closed = False
-    gaze_direction = "center"
-    hand_gestures = []
-    
-    if len(faces) > 0:
-        # Get the largest face
-        largest_face = max(faces, key=lambda face: face[2] * face[3])
-        x, y, w, h = largest_face
-        
-        # Calculate face size ratio
-        face_area = w * h
-        frame_area = frame.shape[0] * frame.shape[1]
-        face_ratio = face_area / frame_area
-        
-        # Extract face region
-        face_roi = gray[y:y+h, x:x+w]
-        
-        # Eye detection
-        eyes = process_frame_full.eye_cascade.detectMultiScale(face_roi, 1.1, 5)
-        eyes_closed = len(eyes) == 0
-        
-        # Gaze direction (simplified)
-        if len(eyes) >= 2:
-            # Sort eyes by x position
-            eyes_sorted = sorted(eyes, key=lambda eye: eye[0])
-            left_eye = eyes_sorted[0]
-            right_eye = eyes_sorted[1]
-            
-            # Calculate relative positions for gaze direction
-            left_center = left_eye[0] + left_eye[2]//2
-            right_center = right_eye[0] + right_eye[2]//2
-            
-            if left_center < w//3:
-                gaze_direction = "left"
-            elif right_center > 2*w//3:
-                gaze_direction = "right"
-            else:
-                gaze_direction = "center"
-        
-        # Smile detection
-        smiles = process_frame_full.smile_cascade.detectMultiScale(face_roi, 1.8, 20)
-        is_smiling = len(smiles) > 0
-        
-        # Mouth opening detection (simplified)
-        mouth_region = face_roi[int(h*0.6):int(h*0.9), int(w*0.2):int(w*0.8)]
-        if mouth_region.size > 0:
-            mouth_edges = cv2.Canny(mouth_region, 50, 150)
-            mouth_ratio = np.sum(mouth_edges > 0) / mouth_region.size
-            is_mouth_open = mouth_ratio > 0.02
-        
-        # Draw face rectangle
-        cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-        
-        # Draw eyes
-        for (ex, ey, ew, eh) in eyes:
-            cv2.rectangle(frame, (x+ex, y+ey), (x+ex+ew, y+ey+eh), (255, 0, 0), 1)
-        
-        # Draw smiles
-        for (sx, sy, sw, sh) in smiles:
-            cv2.rectangle(frame, (x+sx, y+sy), (x+sx+sw, y+sy+sh), (0, 0, 255), 1)
-    
-    # Hand detection (if MediaPipe available)
-    if MEDIAPIPE_AVAILABLE:
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = process_frame_full.hands.process(rgb_frame)
-        
-        if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                # Draw hand landmarks
-                process_frame_full.mp_drawing.draw_landmarks(
-                    frame, hand_landmarks, process_frame_full.mp_hands.HAND_CONNECTIONS)
-                
-                # Simple gesture detection
-                landmarks = hand_landmarks.landmark
-                
-                # Thumbs up detection
-                if (landmarks[4].y < landmarks[3].y and  # Thumb tip above thumb joint
-                    landmarks[8].y > landmarks[6].y and  # Index finger down
-                    landmarks[12].y > landmarks[10].y and  # Middle finger down
-                    landmarks[16].y > landmarks[14].y and  # Ring finger down
-                    landmarks[20].y > landmarks[18].y):   # Pinky down
-                    hand_gestures.append("thumbs_up")
-                
-                # Open hand detection
-                fingers_up = 0
-                for finger_tip, finger_pip in [(8, 6), (12, 10), (16, 14), (20, 18)]:
-                    if landmarks[finger_tip].y < landmarks[finger_pip].y:
-                        fingers_up += 1
-                
-                if fingers_up >= 4:
-                    hand_gestures.append("open_hand")
-                elif fingers_up <= 1:
-                    hand_gestures.append("fist")
-    
-    # Determine expression based on all detections
-    expression = determine_expression(
-        eyes_closed, gaze_direction, is_smiling, is_mouth_open, 
-        hand_gestures, face_ratio, session["images"]
-    )
-    
-    # Update session
-    if expression != session["current_expression"]:
-        if expression is not None and session["images"].get(expression) is not None:
-            session["current_expression"] = expression
-            session["last_valid_expression"] = expression
-    
-    # Encode result frame
-    _, buffer = cv2.imencode('.jpg', frame)
-    result_frame = base64.b64encode(buffer).decode()
-    
-    return {
-        "success": True,
-        "expression": session["current_expression"],
-        "frame": result_frame,
-        "debug": {
-            "face_size": face_ratio,
-            "faces_detected": faces_detected,
-            "smiling": is_smiling,
-            "mouth_open": is_mouth_open,
-            "eyes_closed": eyes_closed,
-            "gaze_direction": gaze_direction,
-            "hand_gestures": hand_gestures,
-            "mode": "full_detection"
-        }
-    }
-
-async def process_frame_mock(frame_data: dict, client_id: str) -> dict:
-    """Process frame with mock detection (fallback)"""
-    import time
-    current_time = time.time()
-    
-    # Mock detection data
-    mock_face_ratio = (current_time % 100) / 100
-    mock_smiling = int(current_time) % 2 == 0
-    mock_eyes_closed = int(current_time * 2) % 3 == 0
-    mock_gaze = ["left", "center", "right"][int(current_time) % 3]
-    mock_hands = ["thumbs_up", "open_hand", "fist"][int(current_time * 1.5) % 3]
-    
-    # Mock expression
-    expressions = ["smiling", "looking_center", "closeup", "eyes_closed", "thumbs_up"]
-    expression = expressions[int(current_time) % len(expressions)]
-    
-    return {
-        "success": True,
-        "expression": expression,
-        "frame": frame_data.get("frame", ""),
-        "debug": {
-            "face_size": mock_face_ratio,
-            "faces_detected": 1 if mock_face_ratio > 0.3 else 0,
-            "smiling": mock_smiling,
-            "mouth_open": False,
-            "eyes_closed": mock_eyes_closed,
-            "gaze_direction": mock_gaze,
-            "hand_gestures": [mock_hands],
-            "mode": "mock_detection"
-        }
-    }
-
-def determine_expression(eyes_closed, gaze_direction, is_smiling, is_mouth_open, hand_gestures, face_ratio, images):
-    """Determine expression based on all detection results"""
-    # Check for closeup first
-    if face_ratio > 0.3 and images.get("closeup"):
-        return "closeup"
-    
-    # Check hand gestures
-    for gesture in hand_gestures:
-        if images.get(gesture):
-            return gesture
-    
-    # Check facial expressions
-    if eyes_closed:
-        if is_smiling and images.get("eyes_closed_smiling"):
-            return "eyes_closed_smiling"
-        elif images.get("eyes_closed_neutral"):
-            return "eyes_closed_neutral"
-    elif is_smiling:
-        if gaze_direction == "left" and images.get("looking_left_smiling"):
-            return "looking_left_smiling"
-        elif gaze_direction == "right" and images.get("looking_right_smiling"):
-            return "looking_right_smiling"
-        elif gaze_direction == "center" and images.get("looking_center_smiling"):
-            return "looking_center_smiling"
-        elif images.get("smiling"):
-            return "smiling"
-    elif is_mouth_open and images.get("shocked"):
-        return "shocked"
-    else:
-        if gaze_direction == "left" and images.get("looking_left"):
-            return "looking_left"
-        elif gaze_direction == "right" and images.get("looking_right"):
-            return "looking_right"
-        elif gaze_direction == "center" and images.get("looking_center"):
-            return "looking_center"
-    
-    return None
-
-def get_html_content():
-    """Return the HTML content for the web interface"""
-    return """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>MEME Tracker Web - Full Version</title>
-    <style>
-        body {
-            font-family: Arial, sans-serif;
-            margin: 0;
-            padding: 20px;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-        }
-        .container {
-            max-width: 1400px;
-            margin: 0 auto;
-            background: white;
-            padding: 30px;
-            border-radius: 15px;
-            box-shadow: 0 10px 30px rgba(0,0,0,0.2);
-        }
-        .header {
-            text-align: center;
-            margin-bottom: 30px;
-        }
-        .header h1 {
-            color: #333;
-            margin: 0;
-            font-size: 2.5em;
-        }
-        .main-content {
-            display: flex;
-            gap: 30px;
-            margin-bottom: 30px;
-        }
-        .video-section {
-            flex: 1;
-        }
-        .controls-section {
-            flex: 1;
-            padding: 20px;
-            background: #f8f9fa;
-            border-radius: 10px;
-            max-height: 600px;
-            overflow-y: auto;
-        }
-        #video {
-            width: 100%;
-            max-width: 640px;
-            border-radius: 10px;
-            border: 3px solid #007bff;
-        }
-        #canvas {
-            display: none;
-        }
-        .status {
-            margin: 15px 0;
-            padding: 15px;
-            background: #e9ecef;
-            border-radius: 8px;
-            border-left: 4px solid #007bff;
-        }
-        .expression-display {
-            margin: 20px 0;
-            padding: 25px;
-            background: linear-gradient(135deg, #007bff, #0056b3);
-            color: white;
-            border-radius: 10px;
-            text-align: center;
-            font-size: 20px;
-            font-weight: bold;
-            box-shadow: 0 5px 15px rgba(0,123,255,0.3);
-        }
-        .controls {
-            margin: 20px 0;
-        }
-        .controls button {
-            background: linear-gradient(135deg, #28a745, #20c997);
-            color: white;
-            border: none;
-            padding: 12px 24px;
-            border-radius: 8px;
-            cursor: pointer;
-            margin: 5px;
-            font-size: 16px;
-            font-weight: bold;
-            transition: all 0.3s ease;
-        }
-        .controls button:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 5px 15px rgba(40,167,69,0.3);
-        }
-        .controls button:disabled {
-            background: #6c757d;
-            cursor: not-allowed;
-            transform: none;
-            box-shadow: none;
-        }
-        .image-uploads {
-            margin: 20px 0;
-        }
-        .image-uploads h4 {
-            margin: 10px 0 5px 0;
-            color: #495057;
-        }
-        .image-uploads input[type="file"] {
-            margin: 5px 0;
-            width: 100%;
-        }
-        .debug-info {
-            margin-top: 20px;
-            padding: 20px;
-            background: #f8f9fa;
-            border-radius: 10px;
-            font-family: 'Courier New', monospace;
-            font-size: 14px;
-            border: 1px solid #dee2e6;
-        }
-        .debug-info h4 {
-            margin-top: 0;
-            color: #495057;
-        }
-        .status-indicator {
-            display: inline-block;
-            width: 12px;
-            height: 12px;
-            border-radius: 50%;
-            margin-right: 8px;
-        }
-        .status-connected { background: #28a745; }
-        .status-disconnected { background: #dc3545; }
-        .status-connecting { background: #ffc107; }
-        .feature-notice {
-            background: #d4edda;
-            border: 1px solid #c3e6cb;
-            color: #155724;
-            padding: 15px;
-            border-radius: 8px;
-            margin: 20px 0;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>🎭 MEME Tracker Web - Full Version</h1>
-            <p>Complete facial expression and hand gesture detection with image selection</p>
-        </div>
-        
-        <div class="feature-notice">
-            <strong>🚀 Full Feature Set:</strong> Face detection, gaze tracking, smile detection, mouth opening, hand gestures, and custom image selection!
-        </div>
-        
-        <div class="main-content">
-            <div class="video-section">
-                <video id="video" autoplay muted></video>
-                <canvas id="canvas"></canvas>
-                
-                <div class="status">
-                    <div id="connection-status">
-                        <span class="status-indicator status-connecting"></span>
-                        Connecting...
-                    </div>
-                    <div id="detection-status">Ready to start detection</div>
-                </div>
-                
-                <div class="expression-display">
-                    <div id="current-expression">No expression detected</div>
-                </div>
-            </div>
-            
-            <div class="controls-section">
-                <h3>🎮 Controls</h3>
-                
-                <div class="controls">
-                    <button id="start-btn" onclick="startDetection()">🚀 Start Detection</button>
-                    <button id="stop-btn" onclick="stopDetection()" disabled>⏹️ Stop Detection</button>
-                </div>
-                
-                <div class="image-uploads">
-                    <h4>📸 Image Uploads</h4>
-                    
-                    <h4>Facial Expressions:</h4>
-                    <input type="file" id="smiling-file" accept="image/*" onchange="uploadImage('smiling', this)">
-                    <input type="file" id="shocked-file" accept="image/*" onchange="uploadImage('shocked', this)">
-                    <input type="file" id="looking_left-file" accept="image/*" onchange="uploadImage('looking_left', this)">
-                    <input type="file" id="looking_right-file" accept="image/*" onchange="uploadImage('looking_right', this)">
-                    <input type="file" id="looking_center-file" accept="image/*" onchange="uploadImage('looking_center', this)">
-                    
-                    <h4>Combined Expressions:</h4>
-                    <input type="file" id="eyes_closed_smiling-file" accept="image/*" onchange="uploadImage('eyes_closed_smiling', this)">
-                    <input type="file" id="looking_center_smiling-file" accept="image/*" onchange="uploadImage('looking_center_smiling', this)">
-                    <input type="file" id="eyes_closed_neutral-file" accept="image/*" onchange="uploadImage('eyes_closed_neutral', this)">
-                    
-                    <h4>Hand Gestures:</h4>
-                    <input type="file" id="thumbs_up-file" accept="image/*" onchange="uploadImage('thumbs_up', this)">
-                    <input type="file" id="open_hand-file" accept="image/*" onchange="uploadImage('open_hand', this)">
-                    <input type="file" id="fist-file" accept="image/*" onchange="uploadImage('fist', this)">
-                    
-                    <h4>Special:</h4>
-                    <input type="file" id="closeup-file" accept="image/*" onchange="uploadImage('closeup', this)">
-                </div>
-                
-                <div class="debug-info" id="debug-info">
-                    <h4>🔍 Debug Information</h4>
-                    <div id="debug-content">Waiting for detection to start...</div>
-                </div>
-            </div>
-        </div>
-    </div>
-
-    <script>
-        let video = document.getElementById('video');
-        let canvas = document.getElementById('canvas');
-        let ctx = canvas.getContext('2d');
-        let ws = null;
-        let clientId = 'client_' + Math.random().toString(36).substr(2, 9);
-        let isDetecting = false;
-        let stream = null;
-
-        // Initialize video stream
-        async function initVideo() {
-            try {
-                stream = await navigator.mediaDevices.getUserMedia({ 
-                    video: { 
-                        width: 640, 
-                        height: 480 
-                    } 
-                });
-                video.srcObject = stream;
-                updateConnectionStatus('connected', 'Camera connected ✅');
-            } catch (err) {
-                updateConnectionStatus('disconnected', 'Camera error: ' + err.message);
-                console.error('Camera error:', err);
-            }
-        }
-
-        // Update connection status
-        function updateConnectionStatus(status, message) {
-            const statusElement = document.getElementById('connection-status');
-            const indicator = statusElement.querySelector('.status-indicator');
-            
-            // Remove all status classes
-            indicator.classList.remove('status-connected', 'status-disconnected', 'status-connecting');
-            
-            // Add current status class
-            indicator.classList.add('status-' + status);
-            
-            statusElement.innerHTML = `<span class="status-indicator status-${status}"></span>${message}`;
-        }
-
-        // Start detection
-        function startDetection() {
-            isDetecting = true;
-            document.getElementById('start-btn').disabled = true;
-            document.getElementById('stop-btn').disabled = false;
-            document.getElementById('detection-status').textContent = 'Detection running...';
-
-            // Connect to WebSocket
-            const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-            ws = new WebSocket(`${protocol}//${window.location.host}/ws/${clientId}`);
-            
-            ws.onopen = function() {
-                console.log('WebSocket connected');
-                updateConnectionStatus('connected', 'WebSocket connected ✅');
-                sendFrames();
-            };
-            
-            ws.onmessage = function(event) {
-                const data = JSON.parse(event.data);
-                if (data.success) {
-                    updateDisplay(data);
-                } else if (data.error) {
-                    console.error('Detection error:', data.error);
-                    updateConnectionStatus('disconnected', 'Detection error: ' + data.error);
-                }
-            };
-            
-            ws.onclose = function() {
-                console.log('WebSocket disconnected');
-                isDetecting = false;
-                document.getElementById('start-btn').disabled = false;
-                document.getElementById('stop-btn').disabled = true;
-                document.getElementById('detection-status').textContent = 'Detection stopped';
-                updateConnectionStatus('disconnected', 'WebSocket disconnected');
-            };
-            
-            ws.onerror = function(error) {
-                console.error('WebSocket error:', error);
-                updateConnectionStatus('disconnected', 'Connection error');
-            };
-        }
-
-        // Stop detection
-        function stopDetection() {
-            isDetecting = false;
-            if (ws) {
-                ws.close();
-            }
-        }
-
-        // Send frames to server
-        function sendFrames() {
-            if (!isDetecting) return;
-
-            canvas.width = video.videoWidth;
-            canvas.height = video.videoHeight;
-            ctx.drawImage(video, 0, 0);
-            
-            const frameData = canvas.toDataURL('image/jpeg', 0.7);
-            const base64Data = frameData.split(',')[1];
-            
-            if (ws && ws.readyState === WebSocket.OPEN) {
-                ws.send(JSON.stringify({
-                    frame: base64Data,
-                    timestamp: Date.now()
-                }));
-            }
-            
-            setTimeout(sendFrames, 200); // 5 FPS for real detection
-        }
-
-        // Update display with detection results
-        function updateDisplay(data) {
-            // Update current expression
-            const expressionDiv = document.getElementById('current-expression');
-            if (data.expression) {
-                expressionDiv.textContent = `🎯 Current Expression: ${data.expression}`;
-            } else {
-                expressionDiv.textContent = '👤 No expression detected';
-            }
-
-            // Update debug info
-            const debugContent = document.getElementById('debug-content');
-            if (data.debug) {
-                debugContent.innerHTML = `
-                    <strong>📊 Detection Stats:</strong><br>
-                    • Face Size: ${(data.debug.face_size * 100).toFixed(1)}%<br>
-                    • Faces: ${data.debug.faces_detected}<br>
-                    • Smiling: ${data.debug.smiling}<br>
-                    • Mouth Open: ${data.debug.mouth_open}<br>
-                    • Eyes Closed: ${data.debug.eyes_closed}<br>
-                    • Gaze: ${data.debug.gaze_direction}<br>
-                    • Hands: ${data.debug.hand_gestures.join(', ') || 'None'}<br>
-                    • Mode: ${data.debug.mode}<br>
-                    • Time: ${new Date().toLocaleTimeString()}
-                `;
-            }
-        }
-
-        // Upload image for expression
-        async function uploadImage(expression, input) {
-            const file = input.files[0];
-            if (!file) return;
-
-            const formData = new FormData();
-            formData.append('file', file);
-
-            try {
-                const response = await fetch(`/upload-image/${expression}`, {
-                    method: 'POST',
-                    body: formData
-                });
-                const result = await response.json();
-                
-                if (result.success) {
-                    console.log(`Image uploaded for ${expression}:`, result.file_path);
-                    // Update session images
-                    if (ws && ws.readyState === WebSocket.OPEN) {
-                        ws.send(JSON.stringify({
-                            type: 'update_image',
-                            expression: expression,
-                            image_path: result.file_path
-                        }));
-                    }
-                } else {
-                    console.error('Upload failed:', result.error);
-                }
-            } catch (err) {
-                console.error('Upload error:', err);
-            }
-        }
-
-        // Initialize on page load
-        window.onload = function() {
-            initVideo();
-        };
-    </script>
-</body>
-</html>
-    """
-
-if __name__ == "__main__":
-    import uvicorn
-    try:
-        port = int(os.environ.get("PORT", "8000"))
-        logger.info(f"Starting MEME Tracker on port {port}")
-        uvicorn.run(app, host="0.0.0.0", port=port, log_level="info")
-    except Exception as e:
-        logger.error(f"Failed to start app: {e}")
-        raise
+"""
+Full MEME Tracker Web Application with all features
+"""
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, UploadFile, File, Form
+from fastapi.responses import Response
+from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import concurrent.futures
+import gzip
+import hashlib
+import logging
+import orjson
+import os
+import base64
+import numpy as np
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+# Setup logging first
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Try to import uvloop for a faster event loop, fallback to asyncio
+try:
+    import uvloop
+    uvloop.install()
+    UVLOOP_AVAILABLE = True
+    logger.info("uvloop installed successfully")
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+# Try to import Numba for the JIT-compiled gesture kernel, fallback to pure Python
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+    logger.info("Numba imported successfully")
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+@njit(cache=True)
+def classify_hand(pts) -> int:
+    """Gesture bitmask (1=thumbs_up, 2=open_hand, 4=fist) from (21,2) landmarks"""
+    fingers_up = 0
+    if pts[8, 1] < pts[6, 1]:
+        fingers_up += 1
+    if pts[12, 1] < pts[10, 1]:
+        fingers_up += 1
+    if pts[16, 1] < pts[14, 1]:
+        fingers_up += 1
+    if pts[20, 1] < pts[18, 1]:
+        fingers_up += 1
+    thumb_up = pts[4, 1] < pts[3, 1]
+
+    mask = 0
+    if thumb_up and fingers_up == 0:
+        mask |= 1
+    if fingers_up >= 4:
+        mask |= 2
+    elif fingers_up <= 1:
+        mask |= 4
+    return mask
+
+# Pre-warm the JIT cache at import so the first frame doesn't pay compile cost
+if NUMBA_AVAILABLE:
+    classify_hand(np.zeros((21, 2), dtype=np.float32))
+
+# Try to import OpenCV, fallback to mock detection if not available
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+    logger.info("OpenCV imported successfully")
+except ImportError as e:
+    OPENCV_AVAILABLE = False
+    logger.warning(f"OpenCV not available: {e}. Using mock detection.")
+
+# Try to import MediaPipe for hand tracking
+try:
+    import mediapipe as mp
+    MEDIAPIPE_AVAILABLE = True
+    logger.info("MediaPipe imported successfully")
+except ImportError as e:
+    MEDIAPIPE_AVAILABLE = False
+    logger.warning(f"MediaPipe not available: {e}. Hand tracking disabled.")
+
+# Load the cascades once at import so the hot path has no per-frame
+# function-attribute probes
+if OPENCV_AVAILABLE:
+    FACE_CASCADE = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    EYE_CASCADE = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+    SMILE_CASCADE = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_smile.xml')
+
+    # JPEG settings for the debug echo: quality 70, baseline — visually
+    # identical for a preview and far cheaper than libjpeg's defaults
+    JPEG_ENCODE_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, 70, cv2.IMWRITE_JPEG_PROGRESSIVE, 0]
+
+# OpenCL T-API: with a usable OpenCL runtime, wrapping the detection input
+# in a UMat runs detectMultiScale through OpenCV's transparent GPU path.
+# Unlike cv2.cuda.CascadeClassifier this uses the standard cascade XMLs, and
+# the ~100 KB downscaled gray upload is sub-millisecond.
+USE_OPENCL = OPENCV_AVAILABLE and cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
+if USE_OPENCL:
+    logger.info("OpenCL T-API enabled for cascade detection")
+
+# Optional DNN face detector: a YuNet ONNX model bundled next to the app (or
+# pointed at via YUNET_MODEL) replaces the face/eye/smile cascade passes with
+# one forward pass returning the box plus 5 landmarks per face
+YUNET_MODEL = os.environ.get("YUNET_MODEL", "face_detection_yunet_2023mar.onnx")
+YUNET_DETECTOR = None
+if OPENCV_AVAILABLE and hasattr(cv2, "FaceDetectorYN") and os.path.exists(YUNET_MODEL):
+    try:
+        YUNET_DETECTOR = cv2.FaceDetectorYN.create(YUNET_MODEL, "", (320, 240), 0.6, 0.3, 5000)
+        logger.info(f"YuNet face detector loaded from {YUNET_MODEL}")
+    except cv2.error as e:
+        logger.warning(f"Failed to load YuNet model: {e}. Using Haar cascades.")
+
+app = FastAPI(title="MEME Tracker Web", version="1.0.0")
+
+# CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@dataclass(slots=True)
+class Session:
+    """Per-client state: uploaded images, detection caches, scratch buffers.
+
+    Slotted so the hot path does attribute-offset loads instead of dict
+    hash probes on every frame.
+    """
+    images: dict = field(default_factory=dict)
+    current_expression: Optional[str] = None
+    last_valid_expression: Optional[str] = None
+    auto_trigger: bool = True
+    buffers: dict = field(default_factory=dict)
+    frame_counter: int = 0
+    empty_streak: int = 0
+    frame_area: Optional[int] = None
+    last_hand_gestures: Optional[list] = None
+    last_hand_overlays: list = field(default_factory=list)
+
+# User sessions storage
+user_sessions: Dict[str, Session] = {}
+
+# Detection thread pool: OpenCV and MediaPipe hold the CPU for tens of ms per
+# frame; running them here keeps the event loop free for other clients
+# (OpenCV/NumPy release the GIL inside native code, so threads do parallelize)
+EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count())
+
+# MediaPipe Hands is NOT thread-safe, and detection runs on the executor's
+# worker threads: each thread lazily builds its own instance so clients can
+# run in parallel without racing one graph
+_tls = threading.local()
+
+def get_hands():
+    """Per-executor-thread MediaPipe Hands instance"""
+    hands = getattr(_tls, "hands", None)
+    if hands is None:
+        # model_complexity=0 is the light model — roughly half the cost with
+        # no practical accuracy loss on the coarse up/down finger heuristics,
+        # and the gesture logic only ever consumes one hand
+        hands = mp.solutions.hands.Hands(
+            static_image_mode=False,
+            max_num_hands=1,
+            model_complexity=0,
+            min_detection_confidence=0.6,
+            min_tracking_confidence=0.5
+        )
+        _tls.hands = hands
+    return hands
+
+@app.get("/")
+async def read_root(request: Request):
+    """Serve the main web interface (encoded and gzipped once at import)"""
+    if request.headers.get("if-none-match") == HTML_ETAG:
+        return Response(status_code=304)
+    headers = {
+        "ETag": HTML_ETAG,
+        "Cache-Control": "public, max-age=3600",
+        "Vary": "Accept-Encoding",
+    }
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=HTML_GZ, media_type="text/html; charset=utf-8", headers=headers)
+    return Response(content=HTML_BYTES, media_type="text/html; charset=utf-8", headers=headers)
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint"""
+    return {"status": "healthy", "message": "MEME Tracker is running!"}
+
+async def send_results(websocket: WebSocket, send_queue: asyncio.Queue):
+    """Writer task: drain pending results and ship them as one JSON list"""
+    while True:
+        batch = [await send_queue.get()]
+        while not send_queue.empty():
+            batch.append(send_queue.get_nowait())
+        # One send per burst amortizes the WS framing + syscall overhead;
+        # orjson emits bytes and handles numpy scalars natively
+        await websocket.send_bytes(orjson.dumps(batch, option=orjson.OPT_SERIALIZE_NUMPY))
+
+async def receive_payload(websocket: WebSocket):
+    """Receive one message; binary frames carry the raw JPEG with no envelope"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    return message["text"]
+
+@app.websocket("/ws/{client_id}")
+async def websocket_endpoint(websocket: WebSocket, client_id: str):
+    """WebSocket endpoint for real-time detection"""
+    await websocket.accept()
+    logger.info(f"Client {client_id} connected")
+    
+    # Initialize user session
+    user_sessions[client_id] = Session()
+
+    # Bounded outbox: a slow client applies backpressure at 4 queued results
+    # instead of growing memory, and the writer coalesces bursts
+    send_queue: asyncio.Queue = asyncio.Queue(maxsize=4)
+    writer = asyncio.create_task(send_results(websocket, send_queue))
+
+    try:
+        while True:
+            # Receive frame data from client; binary frames skip base64+JSON
+            data = await receive_payload(websocket)
+
+            # Latest-frame-wins: drain whatever queued while the previous
+            # frame was processing so detection never runs on stale input.
+            # Text messages are control traffic (update_image) and are
+            # processed rather than dropped.
+            while isinstance(data, (bytes, bytearray)):
+                try:
+                    data = await asyncio.wait_for(receive_payload(websocket), timeout=0.001)
+                except asyncio.TimeoutError:
+                    break
+
+            if isinstance(data, (bytes, bytearray)):
+                frame_data = {"frame_bytes": bytes(data)}
+            else:
+                frame_data = orjson.loads(data)
+
+            # Process frame and enqueue the reply; the writer task sends it
+            result = await process_frame(frame_data, client_id)
+            await send_queue.put(result)
+            
+    except WebSocketDisconnect:
+        logger.info(f"Client {client_id} disconnected")
+        if client_id in user_sessions:
+            del user_sessions[client_id]
+    except Exception as e:
+        logger.error(f"WebSocket error: {e}")
+    finally:
+        writer.cancel()
+
+async def process_frame(frame_data: dict, client_id: str) -> dict:
+    """Process a single frame and return detection results"""
+    try:
+        if OPENCV_AVAILABLE:
+            return await process_frame_full(frame_data, client_id)
+        else:
+            return await process_frame_mock(frame_data, client_id)
+    except Exception as e:
+        logger.error(f"Error processing frame: {e}")
+        return {"error": str(e)}
+
+async def process_frame_full(frame_data: dict, client_id: str) -> dict:
+    """Run the CPU-bound detection pipeline in the thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(EXECUTOR, _process_frame_sync, frame_data, client_id)
+
+def _process_frame_sync(frame_data: dict, client_id: str) -> dict:
+    """Process frame with full detection capabilities"""
+    # Binary senders deliver raw JPEG bytes; legacy clients send base64
+    frame_bytes = frame_data.get("frame_bytes")
+    if frame_bytes is None:
+        frame_bytes = base64.b64decode(frame_data["frame"])
+    frame_array = np.frombuffer(frame_bytes, dtype=np.uint8)
+    frame = cv2.imdecode(frame_array, cv2.IMREAD_COLOR)
+    
+    if frame is None:
+        return {"error": "Invalid frame data"}
+    
+    # Get user session
+    session = user_sessions.get(client_id)
+    if session is None:
+        session = Session()
+    
+    # Convert to grayscale into a reusable per-session buffer: at steady state
+    # the gray and RGB planes stop allocating ~1 MB of fresh pages per frame
+    buffers = session.buffers
+    if buffers.get("gray") is None or buffers["gray"].shape != frame.shape[:2]:
+        buffers["gray"] = np.empty(frame.shape[:2], dtype=np.uint8)
+        # RGB plane for MediaPipe, which runs at half resolution
+        buffers["rgb"] = np.empty((frame.shape[0] // 2, frame.shape[1] // 2, 3), dtype=np.uint8)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=buffers["gray"])
+
+    yunet_rows = None
+    if YUNET_DETECTOR is not None:
+        # One forward pass yields every face box plus its 5 landmarks
+        frame_h, frame_w = frame.shape[:2]
+        YUNET_DETECTOR.setInputSize((frame_w, frame_h))
+        _, rows = YUNET_DETECTOR.detect(frame)
+        yunet_rows = [] if rows is None else list(rows)
+        faces = [(int(r[0]), int(r[1]), int(r[2]), int(r[3])) for r in yunet_rows]
+    else:
+        # Face detection on a fixed-width downscale: Viola-Jones cost scales
+        # with pixel count, and scaleFactor 1.2 walks fewer pyramid levels
+        det_scale = 320 / gray.shape[1]
+        gray_small = cv2.resize(gray, None, fx=det_scale, fy=det_scale,
+                                interpolation=cv2.INTER_AREA)
+        det_input = cv2.UMat(gray_small) if USE_OPENCL else gray_small
+        faces = FACE_CASCADE.detectMultiScale(
+            det_input, scaleFactor=1.2, minNeighbors=4, minSize=(40, 40))
+
+        # Map detections back to full-resolution coordinates; the eye/smile
+        # ROIs below keep operating on the full-res gray image
+        faces = [(int(x / det_scale), int(y / det_scale),
+                  int(w / det_scale), int(h / det_scale)) for (x, y, w, h) in faces]
+    
+    # Initialize variables
+    expression = None
+    face_ratio = 0
+    faces_detected = len(faces)
+    overlays = {"face": None, "eyes": [], "smiles": [], "hand_landmarks": []}
+
+    # Track consecutive faceless frames: after a few of them the scene is
+    # idle and the expensive hand CNN is skipped until a face returns
+    if faces_detected == 0:
+        session.empty_streak += 1
+    else:
+        session.empty_streak = 0
+    is_smiling = False
+    is_mouth_open = False
+    eyes_closed = False
+    gaze_direction = "center"
+    hand_gestures = []
+    
+    if len(faces) > 0:
+        # Get the largest face
+        largest_idx = max(range(len(faces)), key=lambda i: faces[i][2] * faces[i][3])
+        x, y, w, h = faces[largest_idx]
+
+        # Calculate face size ratio (the frame area is cached per session
+        # since the browser's capture resolution is fixed)
+        face_area = w * h
+        frame_area = session.frame_area
+        if frame_area is None:
+            frame_area = frame.shape[0] * frame.shape[1]
+            session.frame_area = frame_area
+        face_ratio = face_area / frame_area
+
+        # Extract face region
+        face_roi = gray[y:y+h, x:x+w]
+
+        if yunet_rows is not None:
+            # Derive gaze and smile from the YuNet landmarks directly: no
+            # eye/smile cascade passes at all
+            row = yunet_rows[largest_idx]
+            right_eye, left_eye = row[4:6], row[6:8]
+            mouth_right, mouth_left = row[10:12], row[12:14]
+            eyes = []
+            smiles = []
+            # Landmarks carry no eyelid state, so eyes count as open
+            eyes_closed = False
+
+            eye_center = (float(right_eye[0]) + float(left_eye[0])) / 2 - x
+            if eye_center < w // 3:
+                gaze_direction = "left"
+            elif eye_center > 2 * w // 3:
+                gaze_direction = "right"
+            else:
+                gaze_direction = "center"
+
+            eye_span = float(np.hypot(*(left_eye - right_eye)))
+            mouth_span = float(np.hypot(*(mouth_left - mouth_right)))
+            is_smiling = eye_span > 0 and (mouth_span / eye_span) > 0.9
+        else:
+            # Eye detection (min size relative to the face ROI skips
+            # impossible tiny-window scales)
+            eyes = EYE_CASCADE.detectMultiScale(face_roi, 1.1, 5, minSize=(w // 12, h // 16))
+            eyes_closed = len(eyes) == 0
+
+            # Gaze direction (simplified)
+            if len(eyes) >= 2:
+                # Sort eyes by x position
+                eyes_sorted = sorted(eyes, key=lambda eye: eye[0])
+                left_eye = eyes_sorted[0]
+                right_eye = eyes_sorted[1]
+
+                # Calculate relative positions for gaze direction
+                left_center = left_eye[0] + left_eye[2]//2
+                right_center = right_eye[0] + right_eye[2]//2
+
+                if left_center < w//3:
+                    gaze_direction = "left"
+                elif right_center > 2*w//3:
+                    gaze_direction = "right"
+                else:
+                    gaze_direction = "center"
+
+            # Smile detection (a real smile spans a decent fraction of the face)
+            smiles = SMILE_CASCADE.detectMultiScale(face_roi, 1.8, 20, minSize=(w // 6, h // 12))
+            is_smiling = len(smiles) > 0
+
+        # Mouth opening detection (simplified): intensity spread in the mouth
+        # ROI is the same "dark lip cavity" signal the old Canny pass measured,
+        # in one SIMD-backed reduction instead of blur+Sobel+NMS+hysteresis
+        mouth_region = face_roi[h * 6 // 10:h * 9 // 10, w // 5:w * 4 // 5]
+        if mouth_region.size > 0:
+            mouth_ratio = float(mouth_region.std()) / 128.0
+            is_mouth_open = mouth_ratio > 0.15
+        
+        # Overlay metadata in frame coordinates; the browser draws these on a
+        # canvas layered over the live video instead of the server rendering
+        # them into pixels
+        overlays["face"] = [int(x), int(y), int(w), int(h)]
+        overlays["eyes"] = [[int(x+ex), int(y+ey), int(ew), int(eh)]
+                            for (ex, ey, ew, eh) in eyes]
+        overlays["smiles"] = [[int(x+sx), int(y+sy), int(sw), int(sh)]
+                              for (sx, sy, sw, sh) in smiles]
+
+    # Hand detection (if MediaPipe available): hand pose changes slowly, so
+    # inference runs on every 2nd frame at half resolution — the landmark
+    # coordinates are normalized 0..1, so nothing needs rescaling
+    run_hands = MEDIAPIPE_AVAILABLE and session.empty_streak <= 3
+    if run_hands:
+        session.frame_counter += 1
+        if session.frame_counter % 2 != 0 and session.last_hand_gestures is not None:
+            hand_gestures = list(session.last_hand_gestures)
+            overlays["hand_landmarks"] = session.last_hand_overlays
+            run_hands = False
+
+    if run_hands:
+        small_bgr = cv2.resize(frame, (frame.shape[1] // 2, frame.shape[0] // 2),
+                               interpolation=cv2.INTER_AREA)
+        rgb_frame = cv2.cvtColor(small_bgr, cv2.COLOR_BGR2RGB, dst=buffers["rgb"])
+        results = get_hands().process(rgb_frame)
+
+        if results.multi_hand_landmarks:
+            for hand_landmarks in results.multi_hand_landmarks:
+                # One pass over the protobuf builds a (21,2) array; the
+                # gesture tests below are vector comparisons instead of
+                # 20+ Python attribute dereferences per hand
+                pts = np.fromiter(
+                    (v for lm in hand_landmarks.landmark for v in (lm.x, lm.y)),
+                    dtype=np.float32, count=42).reshape(21, 2)
+
+                # Hand landmark points for the client-side overlay
+                overlays["hand_landmarks"].append(pts.tolist())
+
+                # Classify in one compiled pass over the landmark array
+                gesture_mask = classify_hand(pts)
+                if gesture_mask & 1:
+                    hand_gestures.append("thumbs_up")
+                if gesture_mask & 2:
+                    hand_gestures.append("open_hand")
+                elif gesture_mask & 4:
+                    hand_gestures.append("fist")
+
+        # Cache for the frames that skip inference
+        session.last_hand_gestures = list(hand_gestures)
+        session.last_hand_overlays = overlays["hand_landmarks"]
+
+    # Determine expression based on all detections
+    expression = determine_expression(
+        eyes_closed, gaze_direction, is_smiling, is_mouth_open, 
+        hand_gestures, face_ratio, session.images
+    )
+    
+    # Update session
+    if expression != session.current_expression:
+        if expression is not None and session.images.get(expression) is not None:
+            session.current_expression = expression
+            session.last_valid_expression = expression
+    
+    result = {
+        "success": True,
+        "expression": session.current_expression,
+        "overlays": overlays,
+        "debug": {
+            "face_size": face_ratio,
+            "faces_detected": faces_detected,
+            "smiling": is_smiling,
+            "mouth_open": is_mouth_open,
+            "eyes_closed": eyes_closed,
+            "gaze_direction": gaze_direction,
+            "hand_gestures": hand_gestures,
+            "mode": "full_detection"
+        }
+    }
+
+    # Debug-only path: echo an annotated frame when the client asks for it
+    if frame_data.get("want_annotated"):
+        face_box = overlays["face"]
+        if face_box:
+            cv2.rectangle(frame, (face_box[0], face_box[1]),
+                         (face_box[0] + face_box[2], face_box[1] + face_box[3]),
+                         (0, 255, 0), 2)
+        _, buffer = cv2.imencode('.jpg', frame, JPEG_ENCODE_PARAMS)
+        result["frame"] = base64.b64encode(buffer).decode()
+
+    return result
+
+async def process_frame_mock(frame_data: dict, client_id: str) -> dict:
+    """Process frame with mock detection (fallback)"""
+    import time
+    current_time = time.time()
+    
+    # Mock detection data
+    mock_face_ratio = (current_time % 100) / 100
+    mock_smiling = int(current_time) % 2 == 0
+    mock_eyes_closed = int(current_time * 2) % 3 == 0
+    mock_gaze = ["left", "center", "right"][int(current_time) % 3]
+    mock_hands = ["thumbs_up", "open_hand", "fist"][int(current_time * 1.5) % 3]
+    
+    # Mock expression
+    expressions = ["smiling", "looking_center", "closeup", "eyes_closed", "thumbs_up"]
+    expression = expressions[int(current_time) % len(expressions)]
+    
+    return {
+        "success": True,
+        "expression": expression,
+        "frame": frame_data.get("frame", ""),
+        "debug": {
+            "face_size": mock_face_ratio,
+            "faces_detected": 1 if mock_face_ratio > 0.3 else 0,
+            "smiling": mock_smiling,
+            "mouth_open": False,
+            "eyes_closed": mock_eyes_closed,
+            "gaze_direction": mock_gaze,
+            "hand_gestures": [mock_hands],
+            "mode": "mock_detection"
+        }
+    }
+
+# Facial-expression rules in priority order: the first rule whose predicate
+# holds and whose image is set wins. The predicates encode the same
+# exclusivity the old nested if-chain had, but adding an expression is one
+# new row instead of a deeper branch.
+EXPRESSION_RULES = (
+    (lambda s: s["eyes_closed"] and s["is_smiling"], "eyes_closed_smiling"),
+    (lambda s: s["eyes_closed"], "eyes_closed_neutral"),
+    (lambda s: not s["eyes_closed"] and s["is_smiling"] and s["gaze"] == "left", "looking_left_smiling"),
+    (lambda s: not s["eyes_closed"] and s["is_smiling"] and s["gaze"] == "right", "looking_right_smiling"),
+    (lambda s: not s["eyes_closed"] and s["is_smiling"] and s["gaze"] == "center", "looking_center_smiling"),
+    (lambda s: not s["eyes_closed"] and s["is_smiling"], "smiling"),
+    (lambda s: not s["eyes_closed"] and not s["is_smiling"] and s["is_mouth_open"], "shocked"),
+    # No is_mouth_open guard here: when the mouth is open but no "shocked"
+    # image is set, the gaze rows still apply (row order already gives
+    # "shocked" priority when its image exists)
+    (lambda s: not s["eyes_closed"] and not s["is_smiling"] and s["gaze"] == "left", "looking_left"),
+    (lambda s: not s["eyes_closed"] and not s["is_smiling"] and s["gaze"] == "right", "looking_right"),
+    (lambda s: not s["eyes_closed"] and not s["is_smiling"] and s["gaze"] == "center", "looking_center"),
+)
+
+def determine_expression(eyes_closed, gaze_direction, is_smiling, is_mouth_open, hand_gestures, face_ratio, images):
+    """Determine expression based on all detection results"""
+    # Closeup and hand gestures outrank the facial-expression table
+    if face_ratio > 0.3 and images.get("closeup"):
+        return "closeup"
+    for gesture in hand_gestures:
+        if images.get(gesture):
+            return gesture
+
+    state = {
+        "eyes_closed": eyes_closed,
+        "gaze": gaze_direction,
+        "is_smiling": is_smiling,
+        "is_mouth_open": is_mouth_open,
+    }
+    for predicate, key in EXPRESSION_RULES:
+        if predicate(state) and images.get(key):
+            return key
+
+    return None
+
+def get_html_content():
+    """Return the HTML content for the web interface"""
+    return """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>MEME Tracker Web - Full Version</title>
+    <style>
+        body {
+            font-family: Arial, sans-serif;
+            margin: 0;
+            padding: 20px;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            min-height: 100vh;
+        }
+        .container {
+            max-width: 1400px;
+            margin: 0 auto;
+            background: white;
+            padding: 30px;
+            border-radius: 15px;
+            box-shadow: 0 10px 30px rgba(0,0,0,0.2);
+        }
+        .header {
+            text-align: center;
+            margin-bottom: 30px;
+        }
+        .header h1 {
+            color: #333;
+            margin: 0;
+            font-size: 2.5em;
+        }
+        .main-content {
+            display: flex;
+            gap: 30px;
+            margin-bottom: 30px;
+        }
+        .video-section {
+            flex: 1;
+        }
+        .controls-section {
+            flex: 1;
+            padding: 20px;
+            background: #f8f9fa;
+            border-radius: 10px;
+            max-height: 600px;
+            overflow-y: auto;
+        }
+        .video-wrapper {
+            position: relative;
+            display: inline-block;
+            width: 100%;
+            max-width: 640px;
+        }
+        #video {
+            width: 100%;
+            border-radius: 10px;
+            border: 3px solid #007bff;
+        }
+        #overlay {
+            position: absolute;
+            top: 0;
+            left: 0;
+            width: 100%;
+            height: 100%;
+            pointer-events: none;
+        }
+        #canvas {
+            display: none;
+        }
+        .status {
+            margin: 15px 0;
+            padding: 15px;
+            background: #e9ecef;
+            border-radius: 8px;
+            border-left: 4px solid #007bff;
+        }
+        .expression-display {
+            margin: 20px 0;
+            padding: 25px;
+            background: linear-gradient(135deg, #007bff, #0056b3);
+            color: white;
+            border-radius: 10px;
+            text-align: center;
+            font-size: 20px;
+            font-weight: bold;
+            box-shadow: 0 5px 15px rgba(0,123,255,0.3);
+        }
+        .controls {
+            margin: 20px 0;
+        }
+        .controls button {
+            background: linear-gradient(135deg, #28a745, #20c997);
+            color: white;
+            border: none;
+            padding: 12px 24px;
+            border-radius: 8px;
+            cursor: pointer;
+            margin: 5px;
+            font-size: 16px;
+            font-weight: bold;
+            transition: all 0.3s ease;
+        }
+        .controls button:hover {
+            transform: translateY(-2px);
+            box-shadow: 0 5px 15px rgba(40,167,69,0.3);
+        }
+        .controls button:disabled {
+            background: #6c757d;
+            cursor: not-allowed;
+            transform: none;
+            box-shadow: none;
+        }
+        .image-uploads {
+            margin: 20px 0;
+        }
+        .image-uploads h4 {
+            margin: 10px 0 5px 0;
+            color: #495057;
+        }
+        .image-uploads input[type="file"] {
+            margin: 5px 0;
+            width: 100%;
+        }
+        .debug-info {
+            margin-top: 20px;
+            padding: 20px;
+            background: #f8f9fa;
+            border-radius: 10px;
+            font-family: 'Courier New', monospace;
+            font-size: 14px;
+            border: 1px solid #dee2e6;
+        }
+        .debug-info h4 {
+            margin-top: 0;
+            color: #495057;
+        }
+        .status-indicator {
+            display: inline-block;
+            width: 12px;
+            height: 12px;
+            border-radius: 50%;
+            margin-right: 8px;
+        }
+        .status-connected { background: #28a745; }
+        .status-disconnected { background: #dc3545; }
+        .status-connecting { background: #ffc107; }
+        .feature-notice {
+            background: #d4edda;
+            border: 1px solid #c3e6cb;
+            color: #155724;
+            padding: 15px;
+            border-radius: 8px;
+            margin: 20px 0;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>🎭 MEME Tracker Web - Full Version</h1>
+            <p>Complete facial expression and hand gesture detection with image selection</p>
+        </div>
+        
+        <div class="feature-notice">
+            <strong>🚀 Full Feature Set:</strong> Face detection, gaze tracking, smile detection, mouth opening, hand gestures, and custom image selection!
+        </div>
+        
+        <div class="main-content">
+            <div class="video-section">
+                <div class="video-wrapper">
+                    <video id="video" autoplay muted></video>
+                    <canvas id="overlay"></canvas>
+                </div>
+                <canvas id="canvas"></canvas>
+
+                <div class="status">
+                    <div id="connection-status">
+                        <span class="status-indicator status-connecting"></span>
+                        Connecting...
+                    </div>
+                    <div id="detection-status">Ready to start detection</div>
+                </div>
+                
+                <div class="expression-display">
+                    <div id="current-expression">No expression detected</div>
+                </div>
+            </div>
+            
+            <div class="controls-section">
+                <h3>🎮 Controls</h3>
+                
+                <div class="controls">
+                    <button id="start-btn" onclick="startDetection()">🚀 Start Detection</button>
+                    <button id="stop-btn" onclick="stopDetection()" disabled>⏹️ Stop Detection</button>
+                </div>
+                
+                <div class="image-uploads">
+                    <h4>📸 Image Uploads</h4>
+                    
+                    <h4>Facial Expressions:</h4>
+                    <input type="file" id="smiling-file" accept="image/*" onchange="uploadImage('smiling', this)">
+                    <input type="file" id="shocked-file" accept="image/*" onchange="uploadImage('shocked', this)">
+                    <input type="file" id="looking_left-file" accept="image/*" onchange="uploadImage('looking_left', this)">
+                    <input type="file" id="looking_right-file" accept="image/*" onchange="uploadImage('looking_right', this)">
+                    <input type="file" id="looking_center-file" accept="image/*" onchange="uploadImage('looking_center', this)">
+                    
+                    <h4>Combined Expressions:</h4>
+                    <input type="file" id="eyes_closed_smiling-file" accept="image/*" onchange="uploadImage('eyes_closed_smiling', this)">
+                    <input type="file" id="looking_center_smiling-file" accept="image/*" onchange="uploadImage('looking_center_smiling', this)">
+                    <input type="file" id="eyes_closed_neutral-file" accept="image/*" onchange="uploadImage('eyes_closed_neutral', this)">
+                    
+                    <h4>Hand Gestures:</h4>
+                    <input type="file" id="thumbs_up-file" accept="image/*" onchange="uploadImage('thumbs_up', this)">
+                    <input type="file" id="open_hand-file" accept="image/*" onchange="uploadImage('open_hand', this)">
+                    <input type="file" id="fist-file" accept="image/*" onchange="uploadImage('fist', this)">
+                    
+                    <h4>Special:</h4>
+                    <input type="file" id="closeup-file" accept="image/*" onchange="uploadImage('closeup', this)">
+                </div>
+                
+                <div class="debug-info" id="debug-info">
+                    <h4>🔍 Debug Information</h4>
+                    <div id="debug-content">Waiting for detection to start...</div>
+                </div>
+            </div>
+        </div>
+    </div>
+
+    <script>
+        let video = document.getElementById('video');
+        let canvas = document.getElementById('canvas');
+        let ctx = canvas.getContext('2d');
+        let overlay = document.getElementById('overlay');
+        let overlayCtx = overlay.getContext('2d');
+        let ws = null;
+        let clientId = 'client_' + Math.random().toString(36).substr(2, 9);
+        let isDetecting = false;
+        let stream = null;
+        const textDecoder = new TextDecoder();
+
+        // Initialize video stream
+        async function initVideo() {
+            try {
+                stream = await navigator.mediaDevices.getUserMedia({ 
+                    video: { 
+                        width: 640, 
+                        height: 480 
+                    } 
+                });
+                video.srcObject = stream;
+                updateConnectionStatus('connected', 'Camera connected ✅');
+            } catch (err) {
+                updateConnectionStatus('disconnected', 'Camera error: ' + err.message);
+                console.error('Camera error:', err);
+            }
+        }
+
+        // Update connection status
+        function updateConnectionStatus(status, message) {
+            const statusElement = document.getElementById('connection-status');
+            const indicator = statusElement.querySelector('.status-indicator');
+            
+            // Remove all status classes
+            indicator.classList.remove('status-connected', 'status-disconnected', 'status-connecting');
+            
+            // Add current status class
+            indicator.classList.add('status-' + status);
+            
+            statusElement.innerHTML = `<span class="status-indicator status-${status}"></span>${message}`;
+        }
+
+        // Start detection
+        function startDetection() {
+            isDetecting = true;
+            document.getElementById('start-btn').disabled = true;
+            document.getElementById('stop-btn').disabled = false;
+            document.getElementById('detection-status').textContent = 'Detection running...';
+
+            // Connect to WebSocket
+            const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+            ws = new WebSocket(`${protocol}//${window.location.host}/ws/${clientId}`);
+            ws.binaryType = 'arraybuffer';
+
+            ws.onopen = function() {
+                console.log('WebSocket connected');
+                updateConnectionStatus('connected', 'WebSocket connected ✅');
+                sendFrames();
+            };
+            
+            ws.onmessage = function(event) {
+                // The server may coalesce several results into one message
+                const text = typeof event.data === 'string' ? event.data : textDecoder.decode(event.data);
+                const parsed = JSON.parse(text);
+                (Array.isArray(parsed) ? parsed : [parsed]).forEach(data => {
+                    if (data.success) {
+                        updateDisplay(data);
+                    } else if (data.error) {
+                        console.error('Detection error:', data.error);
+                        updateConnectionStatus('disconnected', 'Detection error: ' + data.error);
+                    }
+                });
+            };
+            
+            ws.onclose = function() {
+                console.log('WebSocket disconnected');
+                isDetecting = false;
+                document.getElementById('start-btn').disabled = false;
+                document.getElementById('stop-btn').disabled = true;
+                document.getElementById('detection-status').textContent = 'Detection stopped';
+                updateConnectionStatus('disconnected', 'WebSocket disconnected');
+            };
+            
+            ws.onerror = function(error) {
+                console.error('WebSocket error:', error);
+                updateConnectionStatus('disconnected', 'Connection error');
+            };
+        }
+
+        // Stop detection
+        function stopDetection() {
+            isDetecting = false;
+            if (ws) {
+                ws.close();
+            }
+        }
+
+        // Send frames to server
+        function sendFrames() {
+            if (!isDetecting) return;
+
+            canvas.width = video.videoWidth;
+            canvas.height = video.videoHeight;
+            ctx.drawImage(video, 0, 0);
+
+            if (ws && ws.readyState === WebSocket.OPEN) {
+                if (canvas.toBlob) {
+                    // Binary path: raw JPEG blob, no base64 (33% fewer bytes)
+                    canvas.toBlob(function(blob) {
+                        if (blob && ws && ws.readyState === WebSocket.OPEN) {
+                            ws.send(blob);
+                        }
+                    }, 'image/jpeg', 0.7);
+                } else {
+                    // Fallback for browsers without toBlob: base64-in-JSON
+                    const frameData = canvas.toDataURL('image/jpeg', 0.7);
+                    ws.send(JSON.stringify({
+                        frame: frameData.split(',')[1],
+                        timestamp: Date.now()
+                    }));
+                }
+            }
+
+            setTimeout(sendFrames, 200); // 5 FPS for real detection
+        }
+
+        // Draw detection overlays on the canvas layered over the video
+        function drawOverlays(overlays) {
+            overlay.width = video.videoWidth;
+            overlay.height = video.videoHeight;
+            overlayCtx.clearRect(0, 0, overlay.width, overlay.height);
+            if (!overlays) return;
+            overlayCtx.lineWidth = 2;
+            if (overlays.face) {
+                overlayCtx.strokeStyle = '#28a745';
+                overlayCtx.strokeRect(overlays.face[0], overlays.face[1], overlays.face[2], overlays.face[3]);
+            }
+            overlayCtx.lineWidth = 1;
+            overlayCtx.strokeStyle = '#007bff';
+            (overlays.eyes || []).forEach(e => overlayCtx.strokeRect(e[0], e[1], e[2], e[3]));
+            overlayCtx.strokeStyle = '#dc3545';
+            (overlays.smiles || []).forEach(s => overlayCtx.strokeRect(s[0], s[1], s[2], s[3]));
+            // Hand landmarks arrive normalized (0..1)
+            overlayCtx.fillStyle = '#ffc107';
+            (overlays.hand_landmarks || []).forEach(hand => {
+                hand.forEach(pt => {
+                    overlayCtx.beginPath();
+                    overlayCtx.arc(pt[0] * overlay.width, pt[1] * overlay.height, 3, 0, 2 * Math.PI);
+                    overlayCtx.fill();
+                });
+            });
+        }
+
+        // Update display with detection results
+        function updateDisplay(data) {
+            // Draw server-computed overlays client-side
+            drawOverlays(data.overlays);
+
+            // Update current expression
+            const expressionDiv = document.getElementById('current-expression');
+            if (data.expression) {
+                expressionDiv.textContent = `🎯 Current Expression: ${data.expression}`;
+            } else {
+                expressionDiv.textContent = '👤 No expression detected';
+            }
+
+            // Update debug info
+            const debugContent = document.getElementById('debug-content');
+            if (data.debug) {
+                debugContent.innerHTML = `
+                    <strong>📊 Detection Stats:</strong><br>
+                    • Face Size: ${(data.debug.face_size * 100).toFixed(1)}%<br>
+                    • Faces: ${data.debug.faces_detected}<br>
+                    • Smiling: ${data.debug.smiling}<br>
+                    • Mouth Open: ${data.debug.mouth_open}<br>
+                    • Eyes Closed: ${data.debug.eyes_closed}<br>
+                    • Gaze: ${data.debug.gaze_direction}<br>
+                    • Hands: ${data.debug.hand_gestures.join(', ') || 'None'}<br>
+                    • Mode: ${data.debug.mode}<br>
+                    • Time: ${new Date().toLocaleTimeString()}
+                `;
+            }
+        }
+
+        // Upload image for expression
+        async function uploadImage(expression, input) {
+            const file = input.files[0];
+            if (!file) return;
+
+            const formData = new FormData();
+            formData.append('file', file);
+
+            try {
+                const response = await fetch(`/upload-image/${expression}`, {
+                    method: 'POST',
+                    body: formData
+                });
+                const result = await response.json();
+                
+                if (result.success) {
+                    console.log(`Image uploaded for ${expression}:`, result.file_path);
+                    // Update session images
+                    if (ws && ws.readyState === WebSocket.OPEN) {
+                        ws.send(JSON.stringify({
+                            type: 'update_image',
+                            expression: expression,
+                            image_path: result.file_path
+                        }));
+                    }
+                } else {
+                    console.error('Upload failed:', result.error);
+                }
+            } catch (err) {
+                console.error('Upload error:', err);
+            }
+        }
+
+        // Initialize on page load
+        window.onload = function() {
+            initVideo();
+        };
+    </script>
+</body>
+</html>
+    """
+
+# Encode and compress the page once at import; repeat visits get a 304
+HTML_BYTES = get_html_content().encode("utf-8")
+HTML_GZ = gzip.compress(HTML_BYTES, 9)
+HTML_ETAG = hashlib.md5(HTML_BYTES).hexdigest()
+
+if __name__ == "__main__":
+    import uvicorn
+    try:
+        port = int(os.environ.get("PORT", "8000"))
+        logger.info(f"Starting MEME Tracker on port {port}")
+        uvicorn.run(
+            app,
+            host="0.0.0.0",
+            port=port,
+            log_level="info",
+            loop="uvloop" if UVLOOP_AVAILABLE else "auto",
+            http="httptools",
+            ws="websockets",
+        )
+    except Exception as e:
+        logger.error(f"Failed to start app: {e}")
+        raise
@@ -1,434 +1,790 @@
-"""
-MEME Tracker Web Application - Main Entry Point
-"""
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
-from fastapi.middleware.cors import CORSMiddleware
-import json
-import base64
-import cv2
-import numpy as np
-import logging
-import os
-
-# Setup logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-app = FastAPI(title="MEME Tracker Web", version="1.0.0")
-
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-@app.get("/")
-async def read_root():
-    """Serve the main web interface"""
-    return HTMLResponse(content=get_html_content())
-
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "message": "MEME Tracker is running!"}
-
-@app.websocket("/ws/{client_id}")
-async def websocket_endpoint(websocket: WebSocket, client_id: str):
-    """WebSocket endpoint for real-time detection"""
-    await websocket.accept()
-    logger.info(f"Client {client_id} connected")
-    
-    try:
-        while True:
-            # Receive frame data from client
-            data = await websocket.receive_text()
-            frame_data = json.loads(data)
-            
-            # Process frame and return results
-            result = await process_frame(frame_data, client_id)
-            await websocket.send_text(json.dumps(result))
-            
-    except WebSocketDisconnect:
-        logger.info(f"Client {client_id} disconnected")
-    except Exception as e:
-        logger.error(f"WebSocket error: {e}")
-
-async def process_frame(frame_data: dict, client_id: str) -> dict:
-    """Process a single frame and return detection results"""
-    try:
-        # Decode base64 frame
-        frame_bytes = base64.b64decode(frame_data["frame"])
-        frame_array = np.frombuffer(frame_bytes, dtype=np.uint8)
-        frame = cv2.imdecode(frame_array, cv2.IMREAD_COLOR)
-        
-        if frame is None:
-            return {"error": "Invalid frame data"}
-        
-        # Simple face detection for demo
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.1, 4)
-        
-        # Draw rectangles around faces
-        for (x, y, w, h) in faces:
-            cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
-        
-        # Encode result frame
-        _, buffer = cv2.imencode('.jpg', frame)
-        result_frame = base64.b64encode(buffer).decode()
-        
-        if len(faces) > 0:
-            # Face detected
-            face_area = faces[0][2] * faces[0][3]
-            frame_area = frame.shape[0] * frame.shape[1]
-            face_ratio = face_area / frame_area
-            
-            expression = "closeup" if face_ratio > 0.3 else "looking_center"
-            
-            return {
-                "success": True,
-                "expression": expression,
-                "frame": result_frame,
-                "debug": {
-                    "face_size": face_ratio,
-                    "faces_detected": len(faces)
-                }
-            }
-        else:
-            # No face detected
-            return {
-                "success": True,
-                "expression": None,
-                "frame": result_frame,
-                "debug": {"face_size": 0, "faces_detected": 0}
-            }
-            
-    except Exception as e:
-        logger.error(f"Error processing frame: {e}")
-        return {"error": str(e)}
-
-def get_html_content():
-    """Return the HTML content for the web interface"""
-    return """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>MEME Tracker Web</title>
-    <style>
-        body {
-            font-family: Arial, sans-serif;
-            margin: 0;
-            padding: 20px;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-        }
-        .container {
-            max-width: 1200px;
-            margin: 0 auto;
-            background: white;
-            padding: 30px;
-            border-radius: 15px;
-            box-shadow: 0 10px 30px rgba(0,0,0,0.2);
-        }
-        .header {
-            text-align: center;
-            margin-bottom: 30px;
-        }
-        .header h1 {
-            color: #333;
-            margin: 0;
-            font-size: 2.5em;
-        }
-        .header p {
-            color: #666;
-            margin: 10px 0 0 0;
-        }
-        .video-container {
-            display: flex;
-            gap: 30px;
-            margin-bottom: 30px;
-        }
-        .video-section {
-            flex: 1;
-        }
-        .controls-section {
-            flex: 1;
-            padding: 20px;
-            background: #f8f9fa;
-            border-radius: 10px;
-        }
-        #video {
-            width: 100%;
-            max-width: 640px;
-            border-radius: 10px;
-            border: 3px solid #007bff;
-        }
-        #canvas {
-            display: none;
-        }
-        .status {
-            margin: 15px 0;
-            padding: 15px;
-            background: #e9ecef;
-            border-radius: 8px;
-            border-left: 4px solid #007bff;
-        }
-        .expression-display {
-            margin: 20px 0;
-            padding: 25px;
-            background: linear-gradient(135deg, #007bff, #0056b3);
-            color: white;
-            border-radius: 10px;
-            text-align: center;
-            font-size: 20px;
-            font-weight: bold;
-            box-shadow: 0 5px 15px rgba(0,123,255,0.3);
-        }
-        .controls {
-            margin: 20px 0;
-        }
-        .controls button {
-            background: linear-gradient(135deg, #28a745, #20c997);
-            color: white;
-            border: none;
-            padding: 12px 24px;
-            border-radius: 8px;
-            cursor: pointer;
-            margin: 5px;
-            font-size: 16px;
-            font-weight: bold;
-            transition: all 0.3s ease;
-        }
-        .controls button:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 5px 15px rgba(40,167,69,0.3);
-        }
-        .controls button:disabled {
-            background: #6c757d;
-            cursor: not-allowed;
-            transform: none;
-            box-shadow: none;
-        }
-        .debug-info {
-            margin-top: 20px;
-            padding: 20px;
-            background: #f8f9fa;
-            border-radius: 10px;
-            font-family: 'Courier New', monospace;
-            font-size: 14px;
-            border: 1px solid #dee2e6;
-        }
-        .debug-info h4 {
-            margin-top: 0;
-            color: #495057;
-        }
-        .status-indicator {
-            display: inline-block;
-            width: 12px;
-            height: 12px;
-            border-radius: 50%;
-            margin-right: 8px;
-        }
-        .status-connected { background: #28a745; }
-        .status-disconnected { background: #dc3545; }
-        .status-connecting { background: #ffc107; }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>🎭 MEME Tracker Web</h1>
-            <p>Real-time facial expression detection powered by AI</p>
-        </div>
-        
-        <div class="video-container">
-            <div class="video-section">
-                <video id="video" autoplay muted></video>
-                <canvas id="canvas"></canvas>
-                
-                <div class="status">
-                    <div id="connection-status">
-                        <span class="status-indicator status-connecting"></span>
-                        Connecting...
-                    </div>
-                    <div id="detection-status">Ready to start detection</div>
-                </div>
-                
-                <div class="expression-display">
-                    <div id="current-expression">No expression detected</div>
-                </div>
-            </div>
-            
-            <div class="controls-section">
-                <h3>🎮 Controls</h3>
-                
-                <div class="controls">
-                    <button id="start-btn" onclick="startDetection()">🚀 Start Detection</button>
-                    <button id="stop-btn" onclick="stopDetection()" disabled>⏹️ Stop Detection</button>
-                </div>
-                
-                <div class="debug-info" id="debug-info">
-                    <h4>🔍 Debug Information</h4>
-                    <div id="debug-content">Waiting for detection to start...</div>
-                </div>
-            </div>
-        </div>
-    </div>
-
-    <script>
-        let video = document.getElementById('video');
-        let canvas = document.getElementById('canvas');
-        let ctx = canvas.getContext('2d');
-        let ws = null;
-        let clientId = 'client_' + Math.random().toString(36).substr(2, 9);
-        let isDetecting = false;
-        let stream = null;
-
-        // Initialize video stream
-        async function initVideo() {
-            try {
-                stream = await navigator.mediaDevices.getUserMedia({ 
-                    video: { 
-                        width: 640, 
-                        height: 480 
-                    } 
-                });
-                video.srcObject = stream;
-                updateConnectionStatus('connected', 'Camera connected ✅');
-            } catch (err) {
-                updateConnectionStatus('disconnected', 'Camera error: ' + err.message);
-                console.error('Camera error:', err);
-            }
-        }
-
-        // Update connection status
-        function updateConnectionStatus(status, message) {
-            const statusElement = document.getElementById('connection-status');
-            const indicator = statusElement.querySelector('.status-indicator');
-            
-            // Remove all status classes
-            indicator.classList.remove('status-connected', 'status-disconnected', 'status-connecting');
-            
-            // Add current status class
-            indicator.classList.add('status-' + status);
-            
-            statusElement.innerHTML = `<span class="status-indicator status-${status}"></span>${message}`;
-        }
-
-        // Start detection
-        function startDetection() {
-            if (!stream) {
-                alert('Please allow camera access first');
-                return;
-            }
-
-            isDetecting = true;
-            document.getElementById('start-btn').disabled = true;
-            document.getElementById('stop-btn').disabled = false;
-            document.getElementById('detection-status').textContent = 'Detection running...';
-
-            // Connect to WebSocket
-            const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-            ws = new WebSocket(`${protocol}//${window.location.host}/ws/${clientId}`);
-            
-            ws.onopen = function() {
-                console.log('WebSocket connected');
-                updateConnectionStatus('connected', 'WebSocket connected ✅');
-                sendFrames();
-            };
-            
-            ws.onmessage = function(event) {
-                const data = JSON.parse(event.data);
-                if (data.success) {
-                    updateDisplay(data);
-                } else if (data.error) {
-                    console.error('Detection error:', data.error);
-                    updateConnectionStatus('disconnected', 'Detection error: ' + data.error);
-                }
-            };
-            
-            ws.onclose = function() {
-                console.log('WebSocket disconnected');
-                isDetecting = false;
-                document.getElementById('start-btn').disabled = false;
-                document.getElementById('stop-btn').disabled = true;
-                document.getElementById('detection-status').textContent = 'Detection stopped';
-                updateConnectionStatus('disconnected', 'WebSocket disconnected');
-            };
-            
-            ws.onerror = function(error) {
-                console.error('WebSocket error:', error);
-                updateConnectionStatus('disconnected', 'Connection error');
-            };
-        }
-
-        // Stop detection
-        function stopDetection() {
-            isDetecting = false;
-            if (ws) {
-                ws.close();
-            }
-        }
-
-        // Send frames to server
-        function sendFrames() {
-            if (!isDetecting) return;
-
-            canvas.width = video.videoWidth;
-            canvas.height = video.videoHeight;
-            ctx.drawImage(video, 0, 0);
-            
-            const frameData = canvas.toDataURL('image/jpeg', 0.7);
-            const base64Data = frameData.split(',')[1];
-            
-            if (ws && ws.readyState === WebSocket.OPEN) {
-                ws.send(JSON.stringify({
-                    frame: base64Data,
-                    timestamp: Date.now()
-                }));
-            }
-            
-            setTimeout(sendFrames, 200); // ~5 FPS for better performance
-        }
-
-        // Update display with detection results
-        function updateDisplay(data) {
-            // Update current expression
-            const expressionDiv = document.getElementById('current-expression');
-            if (data.expression) {
-                expressionDiv.textContent = `🎯 Current Expression: ${data.expression}`;
-            } else {
-                expressionDiv.textContent = '👤 No expression detected';
-            }
-
-            // Update debug info
-            const debugContent = document.getElementById('debug-content');
-            if (data.debug) {
-                debugContent.innerHTML = `
-                    <strong>📊 Detection Stats:</strong><br>
-                    • Face Size: ${(data.debug.face_size * 100).toFixed(1)}%<br>
-                    • Faces Detected: ${data.debug.faces_detected}<br>
-                    • Timestamp: ${new Date().toLocaleTimeString()}
-                `;
-            }
-        }
-
-        // Initialize on page load
-        window.onload = function() {
-            initVideo();
-        };
-    </script>
-</body>
-</html>
-    """
-
-if __name__ == "__main__":
-    import uvicorn
-    port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+"""
+MEME Tracker Web Application - Main Entry Point
+"""
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse
+from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import concurrent.futures
+import orjson
+import base64
+import logging
+import os
+import threading
+
+# One OpenMP thread per worker process: parallelism comes from uvicorn
+# workers and the detection pool, not nested thread teams inside each cv2
+# call (must be set before OpenCV is imported)
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+import cv2
+import numpy as np
+
+# Keep OpenCV's optimized (SIMD/IPP) code paths on, and cap its internal
+# thread team per process: total CPU use is N workers x CV_THREADS
+cv2.setUseOptimized(True)
+cv2.setNumThreads(int(os.environ.get("CV_THREADS", "1")))
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Try to bind libjpeg-turbo directly: TurboJPEG decodes a JPEG straight to
+# grayscale with SIMD IDCT, roughly twice as fast as going through
+# cv2.imdecode. Any failure (missing wheel or missing system library) falls
+# back to OpenCV, and non-JPEG frames (WebP clients) always use OpenCV.
+try:
+    from turbojpeg import TurboJPEG, TJPF_GRAY
+    TURBO_JPEG = TurboJPEG()
+    logger.info("PyTurboJPEG enabled for JPEG decoding")
+except Exception:
+    TURBO_JPEG = None
+
+# Build the face detector once at import: constructing a CascadeClassifier
+# re-parses the cascade XML, far too expensive to repeat per frame.
+# Prefer the LBP cascade (integer compares + table lookups per stump instead
+# of floating-point Haar sums) and fall back to Haar when the OpenCV build
+# doesn't ship the lbpcascades data (the PyPI wheels don't).
+FACE_CASCADE = cv2.CascadeClassifier(
+    os.path.join(cv2.data.haarcascades, '..', 'lbpcascades', 'lbpcascade_frontalface_improved.xml'))
+if FACE_CASCADE.empty():
+    FACE_CASCADE = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    logger.info("LBP cascade not available, using Haar cascade")
+else:
+    logger.info("Using LBP face cascade")
+
+# Detection pool: threads by default, since OpenCV releases the GIL in its
+# native routines. DETECT_POOL=process swaps in worker processes instead,
+# which also moves the Python-level decode bookkeeping off the event loop's
+# GIL; each worker re-imports this module, so the cascade is loaded once per
+# process, and frames cross the pickle boundary as small JPEG byte strings.
+if os.environ.get("DETECT_POOL", "thread").lower() == "process":
+    EXECUTOR = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count())
+else:
+    EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count())
+
+# Optional GPU cascade: if this OpenCV build has CUDA and a device is
+# present, the per-window cascade stages run across CUDA threads. The GPU
+# classifier wants the CUDA cascade XML variant, so creation may fail on
+# standard data files — any error falls back to the CPU path.
+GPU_CASCADE = None
+if hasattr(cv2, "cuda") and cv2.cuda.getCudaEnabledDeviceCount() > 0:
+    try:
+        GPU_CASCADE = cv2.cuda.CascadeClassifier_create(
+            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        GPU_CASCADE.setScaleFactor(1.2)
+        GPU_CASCADE.setMinNeighbors(3)
+        logger.info("CUDA cascade enabled")
+    except cv2.error as e:
+        GPU_CASCADE = None
+        logger.warning(f"CUDA cascade unavailable: {e}")
+
+# Optional DNN face detector: drop a YuNet ONNX model next to the app (or
+# point YUNET_MODEL at one) and detection becomes a single quantized forward
+# pass through OpenCV's DNN backend instead of the branchy cascade sweep
+YUNET_MODEL = os.environ.get("YUNET_MODEL", "face_detection_yunet_2023mar_int8.onnx")
+YUNET_DETECTOR = None
+if hasattr(cv2, "FaceDetectorYN") and os.path.exists(YUNET_MODEL):
+    try:
+        YUNET_DETECTOR = cv2.FaceDetectorYN.create(YUNET_MODEL, "", (320, 240), 0.6, 0.3, 5000)
+        logger.info(f"YuNet face detector loaded from {YUNET_MODEL}")
+    except cv2.error as e:
+        logger.warning(f"Failed to load YuNet model: {e}. Using cascade.")
+
+# Optional ultra-cheap detection mode: DETECTION_MODE=blob swaps the cascade
+# for a YCrCb skin mask + connected components — a single O(pixels) pass of
+# SIMD-vectorized OpenCV primitives, enough for the coarse closeup heuristic
+DETECTION_MODE = os.environ.get("DETECTION_MODE", "cascade").lower()
+
+# Worker-side scratch buffers, keyed by shape per worker thread/process:
+# bounded by the handful of distinct frame sizes a worker sees, unlike
+# per-client entries, which would leak in long-lived pool workers since the
+# disconnect cleanup only runs in the server process
+_scratch = threading.local()
+
+def _scratch_buffer(shape):
+    """Reusable per-worker uint8 buffer for the given shape"""
+    buffers = getattr(_scratch, "buffers", None)
+    if buffers is None:
+        buffers = _scratch.buffers = {}
+    buf = buffers.get(shape)
+    if buf is None:
+        buf = buffers[shape] = np.empty(shape, dtype=np.uint8)
+    return buf
+
+def _detect_blob(frame):
+    """Bounding box of the largest skin-colored blob, as (found, area_ratio)"""
+    ycrcb = cv2.cvtColor(frame, cv2.COLOR_BGR2YCrCb)
+    mask = cv2.inRange(ycrcb, (0, 133, 77), (255, 173, 127))
+    n, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+    if n <= 1:
+        return False, 0.0
+    largest = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+    # Ignore specks that are clearly not a face
+    if stats[largest, cv2.CC_STAT_AREA] < mask.size * 0.01:
+        return False, 0.0
+    box_area = int(stats[largest, cv2.CC_STAT_WIDTH]) * int(stats[largest, cv2.CC_STAT_HEIGHT])
+    return True, box_area / mask.size
+
+# Per-client detection state: the expression rarely changes frame-to-frame at
+# 5 FPS, so the cascade only runs on every Nth frame and the last result is
+# reused in between
+CLIENT_STATE = {}
+DETECT_EVERY = 3
+
+app = FastAPI(title="MEME Tracker Web", version="1.0.0")
+
+# CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Dispatch queue between the WebSocket handlers and the detection pool: it
+# bounds the frames in flight (drop-oldest under overload), while each frame
+# becomes its own pool task so concurrent clients use every worker
+BATCH_QUEUE = None
+
+async def _dispatch_worker():
+    """Hand each queued frame to the pool as its own task"""
+    loop = asyncio.get_running_loop()
+    while True:
+        frame_data, future = await BATCH_QUEUE.get()
+        if future.done():
+            continue
+        task = loop.run_in_executor(EXECUTOR, _detect, frame_data)
+
+        def _resolve(t, fut=future):
+            if fut.done():
+                return
+            if t.exception() is not None:
+                fut.set_exception(t.exception())
+            else:
+                fut.set_result(t.result())
+
+        task.add_done_callback(_resolve)
+
+@app.on_event("startup")
+async def start_dispatch_worker():
+    """Bind the dispatch queue and worker to the running event loop"""
+    global BATCH_QUEUE
+    BATCH_QUEUE = asyncio.Queue(maxsize=16)
+    asyncio.create_task(_dispatch_worker())
+
+@app.get("/")
+async def read_root():
+    """Serve the main web interface"""
+    return HTMLResponse(content=get_html_content())
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint"""
+    return {"status": "healthy", "message": "MEME Tracker is running!"}
+
+async def send_results(websocket: WebSocket, send_queue: "asyncio.Queue[bytes]"):
+    """Writer task: coalesce queued results into one newline-delimited send"""
+    while True:
+        pending = [await send_queue.get()]
+        while not send_queue.empty():
+            pending.append(send_queue.get_nowait())
+        # One send per burst amortizes the WS framing + syscall overhead
+        await websocket.send_bytes(b"\n".join(pending))
+
+async def receive_payload(websocket: WebSocket):
+    """Receive one message; binary frames carry the raw JPEG with no envelope"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    return message["text"]
+
+@app.websocket("/ws/{client_id}")
+async def websocket_endpoint(websocket: WebSocket, client_id: str):
+    """WebSocket endpoint for real-time detection"""
+    await websocket.accept()
+    logger.info(f"Client {client_id} connected")
+
+    send_queue: "asyncio.Queue[bytes]" = asyncio.Queue()
+    writer = asyncio.create_task(send_results(websocket, send_queue))
+
+    try:
+        while True:
+            # Receive frame data from client; binary frames skip base64+JSON
+            data = await receive_payload(websocket)
+
+            # Latest-frame-wins: drain anything that queued while the last
+            # frame was processing so detection never runs on stale input
+            while True:
+                try:
+                    data = await asyncio.wait_for(receive_payload(websocket), timeout=0.001)
+                except asyncio.TimeoutError:
+                    break
+
+            if isinstance(data, (bytes, bytearray)):
+                frame_data = {"frame_bytes": bytes(data)}
+            else:
+                frame_data = orjson.loads(data)
+
+            # Process frame and enqueue the reply; the writer task sends it.
+            # OPT_SERIALIZE_NUMPY is required: face_ratio is a numpy.float64
+            # on the cascade path and orjson rejects it otherwise.
+            result = await process_frame(frame_data, client_id)
+            send_queue.put_nowait(
+                orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY))
+            
+    except WebSocketDisconnect:
+        logger.info(f"Client {client_id} disconnected")
+    except Exception as e:
+        logger.error(f"WebSocket error: {e}")
+    finally:
+        writer.cancel()
+        CLIENT_STATE.pop(client_id, None)
+
+async def process_frame(frame_data: dict, client_id: str) -> dict:
+    """Queue the frame for the dispatch worker and await its result"""
+    # Every-Nth-frame skipping lives here in the server process, so the
+    # counter and cached result stay consistent no matter which pool worker
+    # (thread or process) a frame lands on
+    st = CLIENT_STATE.setdefault(client_id, {"n": 0, "last": None})
+    st["n"] += 1
+    if st["last"] is not None and st["n"] % DETECT_EVERY != 0:
+        return st["last"]
+
+    future = asyncio.get_running_loop().create_future()
+
+    # Drop-oldest backpressure: when the pipeline is saturated, the stalest
+    # queued frame is abandoned so latency stays bounded instead of queueing
+    while True:
+        try:
+            BATCH_QUEUE.put_nowait((frame_data, future))
+            break
+        except asyncio.QueueFull:
+            try:
+                _, _, stale = BATCH_QUEUE.get_nowait()
+                if not stale.done():
+                    # Routine load-shedding, not a failure: the client
+                    # quietly skips these
+                    stale.set_result({"success": True, "dropped": True})
+            except asyncio.QueueEmpty:
+                pass
+
+    result = await future
+    if result.get("success"):
+        st["last"] = result
+    return result
+
+def _detect(frame_data: dict) -> dict:
+    """Decode the frame and run face detection (called from the thread pool)"""
+    try:
+        # Binary senders deliver raw JPEG bytes; legacy clients send base64
+        frame_bytes = frame_data.get("frame_bytes")
+        if frame_bytes is None:
+            frame_bytes = base64.b64decode(frame_data["frame"])
+        frame_array = np.frombuffer(frame_bytes, dtype=np.uint8)
+
+        if DETECTION_MODE == "blob":
+            frame = cv2.imdecode(frame_array, cv2.IMREAD_COLOR)
+            if frame is None:
+                return {"error": "Invalid frame data"}
+            found, face_ratio = _detect_blob(frame)
+            result = {
+                "success": True,
+                "expression": ("closeup" if face_ratio > 0.3 else "looking_center") if found else None,
+                "debug": {
+                    "face_size": face_ratio,
+                    "faces_detected": 1 if found else 0
+                }
+            }
+            return result
+
+        if YUNET_DETECTOR is not None:
+            # Single DNN forward pass; the ratio logic below is shared
+            frame = cv2.imdecode(frame_array, cv2.IMREAD_COLOR)
+            if frame is None:
+                return {"error": "Invalid frame data"}
+            fh, fw = frame.shape[:2]
+            YUNET_DETECTOR.setInputSize((fw, fh))
+            _, rows = YUNET_DETECTOR.detect(frame)
+            faces = [] if rows is None else [
+                (int(r[0]), int(r[1]), int(r[2]), int(r[3])) for r in rows]
+            total_area = fh * fw
+        else:
+            # Decode straight to grayscale: detection is the only consumer
+            # now, so libjpeg emits one channel and BGR2GRAY disappears
+            if TURBO_JPEG is not None and frame_bytes[:2] == b"\xff\xd8":
+                gray = TURBO_JPEG.decode(frame_bytes, pixel_format=TJPF_GRAY)[:, :, 0]
+            else:
+                gray = cv2.imdecode(frame_array, cv2.IMREAD_GRAYSCALE)
+
+            if gray is None:
+                return {"error": "Invalid frame data"}
+
+            # Simple face detection for demo, on a half-resolution image: only
+            # the face-area ratio is needed, and cascade cost scales with pixels.
+            # The downscale writes into a per-client scratch buffer so steady
+            # frames reuse warm pages instead of a fresh allocation
+            # (cv2.imdecode has no dst=, so the decode itself still allocates).
+            half_h, half_w = gray.shape[0] // 2, gray.shape[1] // 2
+            small_buf = _scratch_buffer((half_h, half_w))
+            small = cv2.resize(gray, (half_w, half_h), dst=small_buf,
+                               interpolation=cv2.INTER_AREA)
+
+            # Bound the scan to plausible webcam face sizes: anything smaller
+            # than a sixth of the frame height can't drive the closeup heuristic
+            sh = small.shape[0]
+            if GPU_CASCADE is not None:
+                # Upload the small gray image and detect on the GPU; the
+                # result rects download as a (1, N, 4) array
+                gpu_small = cv2.cuda_GpuMat()
+                gpu_small.upload(small)
+                downloaded = GPU_CASCADE.detectMultiScale(gpu_small).download()
+                faces = [] if downloaded is None else list(downloaded[0])
+            else:
+                faces = FACE_CASCADE.detectMultiScale(
+                    small,
+                    scaleFactor=1.2,
+                    minNeighbors=3,
+                    minSize=(sh // 6, sh // 6),
+                    maxSize=(sh, sh),
+                    flags=cv2.CASCADE_SCALE_IMAGE,
+                )
+
+            # Scale detections back up to full-resolution coordinates
+            faces = [(x * 2, y * 2, w * 2, h * 2) for (x, y, w, h) in faces]
+            total_area = gray.shape[0] * gray.shape[1]
+        
+        # The client only consumes expression + debug, so nothing is drawn on
+        # the frame and no JPEG re-encode/echo is paid on the reply path
+        if len(faces) > 0:
+            # Face detected
+            face_area = faces[0][2] * faces[0][3]
+            face_ratio = face_area / total_area
+
+            expression = "closeup" if face_ratio > 0.3 else "looking_center"
+
+            result = {
+                "success": True,
+                "expression": expression,
+                # Full-resolution boxes for the client-side overlay canvas
+                "faces": [[int(fx), int(fy), int(fw), int(fh)]
+                          for (fx, fy, fw, fh) in faces],
+                "debug": {
+                    "face_size": face_ratio,
+                    "faces_detected": len(faces)
+                }
+            }
+        else:
+            # No face detected
+            result = {
+                "success": True,
+                "expression": None,
+                "faces": [],
+                "debug": {"face_size": 0, "faces_detected": 0}
+            }
+
+        return result
+            
+    except Exception as e:
+        logger.error(f"Error processing frame: {e}")
+        return {"error": str(e)}
+
+def get_html_content():
+    """Return the HTML content for the web interface"""
+    return """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>MEME Tracker Web</title>
+    <style>
+        body {
+            font-family: Arial, sans-serif;
+            margin: 0;
+            padding: 20px;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            min-height: 100vh;
+        }
+        .container {
+            max-width: 1200px;
+            margin: 0 auto;
+            background: white;
+            padding: 30px;
+            border-radius: 15px;
+            box-shadow: 0 10px 30px rgba(0,0,0,0.2);
+        }
+        .header {
+            text-align: center;
+            margin-bottom: 30px;
+        }
+        .header h1 {
+            color: #333;
+            margin: 0;
+            font-size: 2.5em;
+        }
+        .header p {
+            color: #666;
+            margin: 10px 0 0 0;
+        }
+        .video-container {
+            display: flex;
+            gap: 30px;
+            margin-bottom: 30px;
+        }
+        .video-section {
+            flex: 1;
+        }
+        .controls-section {
+            flex: 1;
+            padding: 20px;
+            background: #f8f9fa;
+            border-radius: 10px;
+        }
+        .video-wrapper {
+            position: relative;
+            display: inline-block;
+            width: 100%;
+            max-width: 640px;
+        }
+        #video {
+            width: 100%;
+            border-radius: 10px;
+            border: 3px solid #007bff;
+        }
+        #overlay {
+            position: absolute;
+            top: 0;
+            left: 0;
+            width: 100%;
+            height: 100%;
+            pointer-events: none;
+        }
+        #canvas {
+            display: none;
+        }
+        .status {
+            margin: 15px 0;
+            padding: 15px;
+            background: #e9ecef;
+            border-radius: 8px;
+            border-left: 4px solid #007bff;
+        }
+        .expression-display {
+            margin: 20px 0;
+            padding: 25px;
+            background: linear-gradient(135deg, #007bff, #0056b3);
+            color: white;
+            border-radius: 10px;
+            text-align: center;
+            font-size: 20px;
+            font-weight: bold;
+            box-shadow: 0 5px 15px rgba(0,123,255,0.3);
+        }
+        .controls {
+            margin: 20px 0;
+        }
+        .controls button {
+            background: linear-gradient(135deg, #28a745, #20c997);
+            color: white;
+            border: none;
+            padding: 12px 24px;
+            border-radius: 8px;
+            cursor: pointer;
+            margin: 5px;
+            font-size: 16px;
+            font-weight: bold;
+            transition: all 0.3s ease;
+        }
+        .controls button:hover {
+            transform: translateY(-2px);
+            box-shadow: 0 5px 15px rgba(40,167,69,0.3);
+        }
+        .controls button:disabled {
+            background: #6c757d;
+            cursor: not-allowed;
+            transform: none;
+            box-shadow: none;
+        }
+        .debug-info {
+            margin-top: 20px;
+            padding: 20px;
+            background: #f8f9fa;
+            border-radius: 10px;
+            font-family: 'Courier New', monospace;
+            font-size: 14px;
+            border: 1px solid #dee2e6;
+        }
+        .debug-info h4 {
+            margin-top: 0;
+            color: #495057;
+        }
+        .status-indicator {
+            display: inline-block;
+            width: 12px;
+            height: 12px;
+            border-radius: 50%;
+            margin-right: 8px;
+        }
+        .status-connected { background: #28a745; }
+        .status-disconnected { background: #dc3545; }
+        .status-connecting { background: #ffc107; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>🎭 MEME Tracker Web</h1>
+            <p>Real-time facial expression detection powered by AI</p>
+        </div>
+        
+        <div class="video-container">
+            <div class="video-section">
+                <div class="video-wrapper">
+                    <video id="video" autoplay muted></video>
+                    <canvas id="overlay"></canvas>
+                </div>
+                <canvas id="canvas"></canvas>
+
+                <div class="status">
+                    <div id="connection-status">
+                        <span class="status-indicator status-connecting"></span>
+                        Connecting...
+                    </div>
+                    <div id="detection-status">Ready to start detection</div>
+                </div>
+                
+                <div class="expression-display">
+                    <div id="current-expression">No expression detected</div>
+                </div>
+            </div>
+            
+            <div class="controls-section">
+                <h3>🎮 Controls</h3>
+                
+                <div class="controls">
+                    <button id="start-btn" onclick="startDetection()">🚀 Start Detection</button>
+                    <button id="stop-btn" onclick="stopDetection()" disabled>⏹️ Stop Detection</button>
+                </div>
+                
+                <div class="debug-info" id="debug-info">
+                    <h4>🔍 Debug Information</h4>
+                    <div id="debug-content">Waiting for detection to start...</div>
+                </div>
+            </div>
+        </div>
+    </div>
+
+    <script>
+        let video = document.getElementById('video');
+        let canvas = document.getElementById('canvas');
+        let ctx = canvas.getContext('2d');
+        let overlay = document.getElementById('overlay');
+        let overlayCtx = overlay.getContext('2d');
+        let ws = null;
+        let clientId = 'client_' + Math.random().toString(36).substr(2, 9);
+        let isDetecting = false;
+        let stream = null;
+        const textDecoder = new TextDecoder();
+        let framePending = false;
+        // WebP compresses better at low quality; fall back to JPEG where the
+        // browser can't encode it (toBlob silently produces PNG otherwise)
+        const WEBP_SUPPORTED = document.createElement('canvas')
+            .toDataURL('image/webp').indexOf('data:image/webp') === 0;
+        const FRAME_MIME = WEBP_SUPPORTED ? 'image/webp' : 'image/jpeg';
+        const FRAME_QUALITY = WEBP_SUPPORTED ? 0.5 : 0.7;
+
+        // Initialize video stream
+        async function initVideo() {
+            try {
+                stream = await navigator.mediaDevices.getUserMedia({ 
+                    video: { 
+                        width: 640, 
+                        height: 480 
+                    } 
+                });
+                video.srcObject = stream;
+                updateConnectionStatus('connected', 'Camera connected ✅');
+            } catch (err) {
+                updateConnectionStatus('disconnected', 'Camera error: ' + err.message);
+                console.error('Camera error:', err);
+            }
+        }
+
+        // Update connection status
+        function updateConnectionStatus(status, message) {
+            const statusElement = document.getElementById('connection-status');
+            const indicator = statusElement.querySelector('.status-indicator');
+            
+            // Remove all status classes
+            indicator.classList.remove('status-connected', 'status-disconnected', 'status-connecting');
+            
+            // Add current status class
+            indicator.classList.add('status-' + status);
+            
+            statusElement.innerHTML = `<span class="status-indicator status-${status}"></span>${message}`;
+        }
+
+        // Start detection
+        function startDetection() {
+            if (!stream) {
+                alert('Please allow camera access first');
+                return;
+            }
+
+            isDetecting = true;
+            framePending = false;  // a frame lost to a dead connection must not block the new one
+            document.getElementById('start-btn').disabled = true;
+            document.getElementById('stop-btn').disabled = false;
+            document.getElementById('detection-status').textContent = 'Detection running...';
+
+            // Connect to WebSocket
+            const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+            ws = new WebSocket(`${protocol}//${window.location.host}/ws/${clientId}`);
+            ws.binaryType = 'arraybuffer';
+
+            ws.onopen = function() {
+                console.log('WebSocket connected');
+                updateConnectionStatus('connected', 'WebSocket connected ✅');
+                sendFrames();
+            };
+            
+            ws.onmessage = function(event) {
+                framePending = false;
+                const text = typeof event.data === 'string' ? event.data : textDecoder.decode(event.data);
+                // The server may coalesce several results into one message
+                text.split('\\n').forEach(part => {
+                    if (!part) return;
+                    const data = JSON.parse(part);
+                    if (data.dropped) return;  // shed frame, keep the last display
+                    if (data.success) {
+                        updateDisplay(data);
+                    } else if (data.error) {
+                        console.error('Detection error:', data.error);
+                        updateConnectionStatus('disconnected', 'Detection error: ' + data.error);
+                    }
+                });
+                // Backpressure: only capture the next frame once the server
+                // has answered, aligned with the compositor
+                requestAnimationFrame(sendFrames);
+            };
+            
+            ws.onclose = function() {
+                console.log('WebSocket disconnected');
+                isDetecting = false;
+                document.getElementById('start-btn').disabled = false;
+                document.getElementById('stop-btn').disabled = true;
+                document.getElementById('detection-status').textContent = 'Detection stopped';
+                updateConnectionStatus('disconnected', 'WebSocket disconnected');
+            };
+            
+            ws.onerror = function(error) {
+                console.error('WebSocket error:', error);
+                updateConnectionStatus('disconnected', 'Connection error');
+            };
+        }
+
+        // Stop detection
+        function stopDetection() {
+            isDetecting = false;
+            if (ws) {
+                ws.close();
+            }
+        }
+
+        // Send frames to server (paced by server replies, not a fixed timer)
+        function sendFrames() {
+            if (!isDetecting) return;
+            // Skip if a frame is in flight or the socket buffer is backed up,
+            // but poll again: with nothing in flight no reply will arrive to
+            // re-trigger this, and the loop would otherwise halt forever
+            if (framePending || !ws || ws.bufferedAmount > 65536) {
+                setTimeout(sendFrames, 100);
+                return;
+            }
+
+            canvas.width = video.videoWidth;
+            canvas.height = video.videoHeight;
+            ctx.drawImage(video, 0, 0);
+            
+            if (ws && ws.readyState === WebSocket.OPEN) {
+                if (canvas.toBlob) {
+                    // Binary path: raw WebP/JPEG blob, no base64
+                    framePending = true;
+                    canvas.toBlob(function(blob) {
+                        if (blob && ws && ws.readyState === WebSocket.OPEN) {
+                            ws.send(blob);
+                        } else {
+                            framePending = false;
+                        }
+                    }, FRAME_MIME, FRAME_QUALITY);
+                } else {
+                    // Fallback for browsers without toBlob: base64-in-JSON
+                    const frameData = canvas.toDataURL('image/jpeg', 0.7);
+                    ws.send(JSON.stringify({
+                        frame: frameData.split(',')[1],
+                        timestamp: Date.now()
+                    }));
+                    framePending = true;
+                }
+            }
+        }
+
+        // Draw face rectangles on the canvas layered over the video
+        function drawOverlays(faces) {
+            overlay.width = video.videoWidth;
+            overlay.height = video.videoHeight;
+            overlayCtx.clearRect(0, 0, overlay.width, overlay.height);
+            overlayCtx.lineWidth = 2;
+            overlayCtx.strokeStyle = '#007bff';
+            (faces || []).forEach(f => overlayCtx.strokeRect(f[0], f[1], f[2], f[3]));
+        }
+
+        // Update display with detection results
+        function updateDisplay(data) {
+            // Draw server-computed boxes client-side
+            drawOverlays(data.faces);
+
+            // Update current expression
+            const expressionDiv = document.getElementById('current-expression');
+            if (data.expression) {
+                expressionDiv.textContent = `🎯 Current Expression: ${data.expression}`;
+            } else {
+                expressionDiv.textContent = '👤 No expression detected';
+            }
+
+            // Update debug info
+            const debugContent = document.getElementById('debug-content');
+            if (data.debug) {
+                debugContent.innerHTML = `
+                    <strong>📊 Detection Stats:</strong><br>
+                    • Face Size: ${(data.debug.face_size * 100).toFixed(1)}%<br>
+                    • Faces Detected: ${data.debug.faces_detected}<br>
+                    • Timestamp: ${new Date().toLocaleTimeString()}
+                `;
+            }
+        }
+
+        // Initialize on page load
+        window.onload = function() {
+            initVideo();
+        };
+    </script>
+</body>
+</html>
+    """
+
+if __name__ == "__main__":
+    import uvicorn
+    port = int(os.environ.get("PORT", 8000))
+    # Import string so uvicorn can fork one worker per core; WebSocket
+    # clients sticky-route to the worker that accepted their handshake
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        workers=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+    )